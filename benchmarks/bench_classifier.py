@@ -0,0 +1,106 @@
+"""Benchmark phân loại link: cách cũ (2 lần re.findall + so khớp chuỗi con) và link_classifier.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/bench_classifier.py [--seconds 2]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_classifier import affiliate_links  # noqa: E402
+
+# 💬 Tin nhắn kiểu thực tế trong các group săn deal
+CORPUS = [
+    "Xin chào cả nhà, hôm nay có deal gì không ạ?",
+    "https://s.shopee.vn/AbCdEf123",
+    "Deal hot nè 🔥 https://s.shopee.vn/5fRtq1Wx2Z mua ngay kẻo hết",
+    "https://shopee.vn/Áo-thun-nam-cotton-i.123456789.987654321?sp_atk=1a2b3c&xptdk=4d5e6f",
+    "Link sp: https://vn.shp.ee/Qw8sDk2 (freeship)",
+    "https://shp.ee/abc123xyz",
+    "Lazada sale 12.12: https://s.lazada.vn/s.Zx9Kq ⚡",
+    "https://www.lazada.vn/products/tai-nghe-bluetooth-i2345678901-s11223344556.html?spm=a2o4n.home.flash.1",
+    "Tổng hợp deal hôm nay:\n1. https://s.shopee.vn/A1b2C3\n2. https://s.shopee.vn/D4e5F6\n"
+    "3. https://lzd.co/Xy7Z\n4. https://shopee.vn/product/12345/67890?smtt=0.0.9\n5. https://s.shopee.vn/A1b2C3",
+    "Xem review ở đây https://example.com/review?from=https://shopee.vn/product/1/2 rồi hãy mua",
+    "Mã giảm giá FREESHIP50K áp dụng đến 23h59",
+    "https://tiki.vn/dien-thoai-p123456.html",
+    "Shopee mall: https://shopee.vn/ (trang chủ)",
+    "https://m.lazada.vn/products/i555666777.html",
+    "Mọi người ơi https://vn.shp.ee/ZZ11 và https://shp.ee/YY22 cái nào rẻ hơn?",
+    "0987654321 - Liên hệ shop",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "Link nè (https://s.shopee.vn/Paren01).",
+]
+
+
+# 🐢 Cách cũ: pattern dạng chuỗi trong handle_message + so khớp chuỗi con trong process_link
+def classify_old(text):
+    shopee_pattern = r'(https?://(?:shopee\.vn|shp\.ee|vn\.shp\.ee|s\.shopee\.vn)/\S+)'
+    lazada_pattern = r'(https?://(?:lazada\.vn|www\.lazada\.vn|lzd\.co|m\.lazada\.vn|s\.lazada\.vn)/\S+)'
+    shopee_matches = re.findall(shopee_pattern, text)
+    lazada_matches = re.findall(lazada_pattern, text)
+    links = list(dict.fromkeys(
+        [(link, "shopee") for link in shopee_matches] + [(link, "lazada") for link in lazada_matches]
+    ))
+    result = []
+    for link, platform in links:
+        if platform == "shopee" and "s.shopee.vn" in link:
+            kind = "expand"
+        elif platform == "shopee" and ("vn.shp.ee" in link or "shp.ee" in link):
+            kind = "direct_short"
+        elif platform == "lazada" and ("lzd.co" in link or "s.lazada.vn" in link):
+            kind = "expand"
+        else:
+            kind = "full"
+        result.append((link, platform, kind))
+    return result
+
+
+# 🚀 Cách mới: link_classifier (một lần quét, phân loại theo host)
+def classify_new(text):
+    result = []
+    for record in affiliate_links(text):
+        if record.needs_expansion:
+            kind = "expand"
+        elif record.is_short:
+            kind = "direct_short"
+        else:
+            kind = "full"
+        result.append((record.url, record.platform, kind))
+    return result
+
+
+def bench(func, seconds):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for text in CORPUS:
+            func(text)
+        count += len(CORPUS)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark phân loại link trong tin nhắn")
+    parser.add_argument("--seconds", type=float, default=2.0, help="thời gian đo mỗi cách")
+    args = parser.parse_args()
+
+    old_rate = bench(classify_old, args.seconds)
+    new_rate = bench(classify_new, args.seconds)
+    print(f"{'cách':<10} {'tin nhắn/giây':>14}")
+    print(f"{'cũ':<10} {old_rate:>14,.0f}")
+    print(f"{'mới':<10} {new_rate:>14,.0f}  ({new_rate / old_rate:.2f}x)")
+
+    print("\nKhác biệt phân loại (cũ → mới):")
+    for text in CORPUS:
+        old, new = classify_old(text), classify_new(text)
+        if old != new:
+            print(f"- {text!r}\n    cũ:  {old}\n    mới: {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark render QR: đường cũ (qrcode.make + PIL mặc định) và QR engine mới.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/bench_qr.py [--seconds 2] [--workers 4]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode  # noqa: E402
+
+from qr_engine import QREngine, render_qr_png  # noqa: E402
+
+PAYLOAD_SIZES = [16, 64, 256, 1024, 2048]
+
+
+def make_payload(size):
+    base = "https://s.shopee.vn/AbCdEf123?text=Sản phẩm giảm giá "
+    return (base * (size // len(base) + 1))[:size]
+
+
+def render_old(payload):
+    """Đường cũ: generate_qr_code trong bot_telegram.py."""
+    buffer = io.BytesIO()
+    qrcode.make(payload).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def bench_sync(func, payload, seconds):
+    count = 0
+    size = len(func(payload))
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func(payload)
+        count += 1
+    return count / (time.perf_counter() - started), size
+
+
+async def bench_pool(engine, payload, seconds, concurrency):
+    await engine.render(payload)  # warm-up process con
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        await asyncio.gather(*(engine.render(payload) for _ in range(concurrency)))
+        count += concurrency
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="thời gian đo cho mỗi trường hợp")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="số process của QR engine")
+    args = parser.parse_args()
+
+    print(f"{'payload':>8} | {'old r/s':>9} {'old bytes':>10} | {'new r/s':>9} {'new bytes':>10} | "
+          f"{'pool r/s':>9} ({args.workers} proc)")
+    engine = QREngine(workers=args.workers)
+    try:
+        for size in PAYLOAD_SIZES:
+            payload = make_payload(size)
+            try:
+                old_rate, old_bytes = bench_sync(render_old, payload, args.seconds)
+                old = f"{old_rate:9.1f} {old_bytes:10d}"
+            except qrcode.exceptions.DataOverflowError:
+                old = f"{'overflow':>9} {'-':>10}"
+            new_rate, new_bytes = bench_sync(render_qr_png, payload, args.seconds)
+            pool_rate = asyncio.run(bench_pool(engine, payload, args.seconds, args.workers * 2))
+            print(f"{size:>8} | {old} | {new_rate:9.1f} {new_bytes:10d} | {pool_rate:9.1f}")
+    finally:
+        engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
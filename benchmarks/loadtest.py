@@ -0,0 +1,477 @@
+"""Load test offline cho bot_telegram.py: Bot API giả, AccessTrade giả và chuỗi redirect giả.
+
+Bot chạy thật (handler, cache, batcher, scheduler, QR engine); mọi request mạng đi
+vào một server aiohttp local với độ trễ và tỉ lệ lỗi cấu hình được.
+
+Chạy từ thư mục gốc repo:
+    python benchmarks/loadtest.py --rate 50 --duration 20
+    python benchmarks/loadtest.py --rate 200 --duration 30 --accesstrade-latency 300 --accesstrade-error-rate 0.05
+    python benchmarks/loadtest.py --rate 200 --duration 30 --workers 4   # BOT_RUN_MODE=workers
+
+Các biến môi trường của bot (SCHED_*, ACCESSTRADE_RATE_PER_SEC, QR_PROCESS_WORKERS, ...)
+vẫn có hiệu lực nếu được đặt trước khi chạy.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import resource
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOKEN = "123456:LOADTEST"
+CAMPAIGNS = [
+    {"id": "4751584435713464237", "merchant": "shopee"},
+    {"id": "5127144557053758578", "merchant": "lazadacps"},
+    {"id": "4348611760548105593", "merchant": "tiki"},
+]
+TEXT_SAMPLES = [
+    "Xin chào cả nhà",
+    "Mã giảm giá FREESHIP tháng này",
+    "0987654321",
+    "Wifi: NhaTro123 / matkhau: 12345678",
+    "https://example.com/bai-viet/khuyen-mai-cuoi-tuan",
+]
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def fmt_ms(value):
+    return "-" if value is None else f"{value * 1000:8.1f}"
+
+
+class StaticResolver(AbstractResolver):
+    """Trỏ mọi hostname (s.shopee.vn, lzd.co, api.accesstrade.vn, ...) về server giả local."""
+
+    def __init__(self, port):
+        self.port = port
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{
+            "hostname": host, "host": "127.0.0.1", "port": self.port,
+            "family": socket.AF_INET, "proto": 0, "flags": socket.AI_NUMERICHOST,
+        }]
+
+    async def close(self):
+        pass
+
+
+class FakeServices:
+    """Bot API + AccessTrade + shortener giả trong cùng một server aiohttp (phân biệt theo Host)."""
+
+    def __init__(self, args):
+        self.args = args
+        self.updates = []  # update chờ getUpdates
+        self.update_event = asyncio.Event()
+        self.next_update_id = itertools.count(1)
+        # message_id khác nhau giữa các lần chạy → không bị dedup khi nạp lại snapshot (STATE_SNAPSHOT_PATH cố định)
+        self.next_message_id = itertools.count(int(time.time()) * 1000)
+        self.pending = {}  # (chat_id, message_id) -> (sent_at, kind)
+        self.latencies = defaultdict(list)  # kind -> [giây]
+        self.calls = Counter()
+        self.files = {}  # file_id -> bytes (file người dùng gửi lên)
+        self.documents = []  # (tên file, byte) bot gửi về
+        self.sent = 0
+        self.first_sent = None
+        self.last_done = None
+
+    async def _delay(self, latency_ms):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+
+    # 📩 Sinh update
+    def push_message(self, chat_id, user_id, text, kind, **fields):
+        message_id = next(self.next_message_id)
+        now = time.perf_counter()
+        self.pending[(chat_id, message_id)] = (now, kind)
+        self.sent += 1
+        self.first_sent = self.first_sent or now
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"Group {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+        }
+        if text is not None:
+            message["text"] = text
+        message.update(fields)
+        self.updates.append({"update_id": next(self.next_update_id), "message": message})
+        self.update_event.set()
+
+    def push_document(self, chat_id, user_id, content, file_name, caption=None):
+        """Gửi file (vd. danh sách link cho chuyển đổi hàng loạt); hoàn tất khi bot trả sendDocument."""
+        file_id = f"BQACAgUAAx{random.getrandbits(64):x}"
+        self.files[file_id] = content.encode()
+        fields = {"document": {"file_id": file_id, "file_unique_id": file_id[-12:],
+                               "file_name": file_name, "file_size": len(self.files[file_id])}}
+        if caption:
+            fields["caption"] = caption
+        self.push_message(chat_id, user_id, None, "bulk", **fields)
+
+    def _complete(self, chat_id, reply_to):
+        entry = self.pending.pop((chat_id, reply_to), None)
+        if entry is not None:
+            sent_at, kind = entry
+            self.last_done = time.perf_counter()
+            self.latencies[kind].append(self.last_done - sent_at)
+
+    # 🤖 Bot API
+    async def bot_api(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        await self._delay(self.args.bot_latency)
+        if random.random() < self.args.bot_error_rate:
+            return web.json_response({"ok": False, "error_code": 500, "description": "Internal Server Error"})
+
+        chat_id = int(params["chat_id"]) if "chat_id" in params else 0
+        reply_to = params.get("reply_to_message_id")
+        if "reply_parameters" in params:
+            reply_to = json.loads(params["reply_parameters"]).get("message_id")
+        reply_to = int(reply_to) if reply_to else None
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+        elif method in ("sendMessage", "sendPhoto", "editMessageText"):
+            result = self._message(chat_id, photo=(method == "sendPhoto"))
+            if method == "sendPhoto":
+                self._complete(chat_id, reply_to)
+        elif method == "getFile":
+            file_id = params["file_id"]
+            result = {"file_id": file_id, "file_unique_id": file_id[-12:],
+                      "file_size": len(self.files[file_id]), "file_path": f"documents/{file_id}"}
+        elif method == "sendDocument":
+            document = params.get("document")
+            if hasattr(document, "file"):
+                self.documents.append((document.filename, document.file.read()))
+            result = self._message(chat_id)
+            self._complete(chat_id, reply_to)
+        elif method == "sendMediaGroup":
+            media = json.loads(params["media"])
+            result = [self._message(chat_id, photo=True) for _ in media]
+            self._complete(chat_id, reply_to)
+        else:  # deleteMessage, sendChatAction, deleteWebhook, ...
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def download(self, request):
+        await self._delay(self.args.bot_latency)
+        return web.Response(body=self.files[request.match_info["file_id"]])
+
+    def _message(self, chat_id, photo=False):
+        message = {
+            "message_id": next(self.next_message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup"},
+        }
+        if photo:
+            file_id = f"AgACAgUAAx{random.getrandbits(64):x}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id[-12:], "width": 500, "height": 500}]
+        return message
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self.update_event.clear()
+            try:
+                await asyncio.wait_for(self.update_event.wait(), timeout=min(float(params.get("timeout", 1) or 1), 1))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit", 100) or 100)
+        return web.json_response({"ok": True, "result": self.updates[:limit]})
+
+    # 💸 AccessTrade
+    async def accesstrade(self, request):
+        await self._delay(self.args.accesstrade_latency)
+        self.calls[f"accesstrade{request.path}"] += 1
+        if random.random() < self.args.accesstrade_error_rate:
+            return web.Response(status=502, text="Bad Gateway")
+        if request.path == "/v1/campaigns":
+            return web.json_response({"data": CAMPAIGNS, "total": len(CAMPAIGNS)})
+        body = await request.json()
+        success = [
+            {"url_origin": url, "short_link": f"https://shorten.asia/{abs(hash(url)) % 10**8:08d}",
+             "aff_link": f"https://go.isclix.com/deep_link/{body['campaign_id']}?url={url}"}
+            for url in body["urls"]
+        ]
+        return web.json_response({"success": True, "data": {"success_link": success, "error_link": [], "suspend_url": []}})
+
+    # ↪️ Chuỗi redirect của link rút gọn
+    async def redirect(self, request, host):
+        await self._delay(self.args.redirect_latency)
+        self.calls[f"redirect:{host}"] += 1
+        if random.random() < self.args.redirect_error_rate:
+            return web.Response(status=500)
+        item = request.path.strip("/").lstrip("p") or "0"
+        if host == "s.shopee.vn":
+            location = f"https://shopee.vn/product/100{int(item) % 7}/{item}?smtt=0.0.9"
+        elif host == "lzd.co":
+            location = f"http://s.lazada.vn/p{item}"
+        else:  # s.lazada.vn
+            location = f"https://www.lazada.vn/products/san-pham-i{item}-s{item}1.html"
+        raise web.HTTPFound(location)
+
+    async def handle(self, request):
+        host = request.host.split(":")[0]
+        if request.path.startswith("/bot"):
+            return await self.bot_api(request)
+        if host == "api.accesstrade.vn":
+            try:
+                return await self.accesstrade(request)
+            except ConnectionResetError:
+                # Bot huỷ request (vd. request hedge thua) trước khi gửi xong body
+                return web.Response(status=499)
+        if host in ("s.shopee.vn", "lzd.co", "s.lazada.vn"):
+            return await self.redirect(request, host)
+        return web.Response(status=404)
+
+    def make_app(self):
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.bot_api)
+        app.router.add_get("/file/bot{token}/documents/{file_id}", self.download)
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+
+class MessageMix:
+    """Sinh nội dung tin nhắn: text → QR, 1 link, nhiều link."""
+
+    def __init__(self, args):
+        self.weights = {"text": args.text_ratio, "single": args.single_ratio, "multi": args.multi_ratio}
+        self.products = args.products
+        self.links_per_multi = args.links_per_multi
+
+    def _link(self):
+        item = random.randrange(self.products)
+        return random.choice([
+            f"http://s.shopee.vn/p{item}",
+            f"http://lzd.co/p{item}",
+            f"https://shopee.vn/san-pham-i.100{item % 7}.{item}?sp_atk=abc",
+        ])
+
+    def next(self):
+        kind = random.choices(list(self.weights), weights=list(self.weights.values()))[0]
+        if kind == "text":
+            return kind, random.choice(TEXT_SAMPLES) + f" #{random.randrange(1000)}"
+        if kind == "single":
+            return kind, f"Deal hot nè 🔥 {self._link()}"
+        links = "\n".join(f"{i + 1}. {self._link()}" for i in range(self.links_per_multi))
+        return kind, f"Tổng hợp deal hôm nay:\n{links}"
+
+
+def configure_env(port, workdir):
+    """Trỏ bot vào server giả (phải gọi trước khi import bot_telegram)."""
+    os.environ["TELEGRAM_BOT_TOKEN"] = TOKEN
+    os.environ["ACCESSTRADE_TOKEN"] = "loadtest"
+    os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{port}/bot"
+    os.environ["TELEGRAM_FILE_BASE_URL"] = f"http://127.0.0.1:{port}/file/bot"
+    os.environ["ACCESSTRADE_API_BASE"] = "http://api.accesstrade.vn"
+    os.environ.setdefault("LINK_CACHE_PATH", os.path.join(workdir, "link_cache.sqlite3"))
+    os.environ.setdefault("QR_CACHE_PATH", os.path.join(workdir, "qr_cache.sqlite3"))
+    os.environ.setdefault("STATE_SNAPSHOT_PATH", os.path.join(workdir, "state_snapshot.json"))
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("BOT_INSTANCE_ID", "loadtest")
+
+
+def build_worker_application():
+    """App factory cho worker process (--workers): mọi request mạng đi vào server giả."""
+    import bot_telegram
+
+    bot_telegram.http_client.resolver = StaticResolver(int(os.environ["LOADTEST_PORT"]))
+    return bot_telegram.build_application()
+
+
+async def run(args):
+    services = FakeServices(args)
+    runner = web.AppRunner(services.make_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    workdir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    configure_env(port, workdir)
+    os.environ["LOADTEST_PORT"] = str(port)
+    os.environ["WORKER_PROCESSES"] = str(args.workers or 1)
+
+    import bot_telegram
+    import metrics
+
+    # Thu mẫu thô của từng stage để tính p50/p95/p99 chính xác (histogram chỉ có bucket)
+    stage_samples = defaultdict(list)
+    observe = metrics.stage_duration.observe
+
+    def observe_and_record(value, **labels):
+        stage_samples[labels.get("stage")].append(value)
+        observe(value, **labels)
+
+    metrics.stage_duration.observe = observe_and_record
+
+    if args.workers:
+        # Chế độ workers: process này là ingress, stage chỉ đo được trong worker (bảng stage để trống)
+        from worker_pool import WorkerPool, run_ingress
+
+        bot_telegram.http_client.resolver = StaticResolver(port)
+        pool = WorkerPool(args.workers, build_worker_application, worker_env=bot_telegram.worker_env)
+        stop_ingress = asyncio.Event()
+        ingress = asyncio.create_task(run_ingress(
+            f"{bot_telegram.TELEGRAM_API_BASE_URL}{TOKEN}", pool, bot_telegram.ALLOWED_UPDATES,
+            poll_timeout=1, stop_event=stop_ingress,
+        ))
+        while services.calls["getMe"] < args.workers:  # chờ mọi worker initialize xong
+            await asyncio.sleep(0.05)
+    else:
+        bot_telegram.http_client.resolver = StaticResolver(port)
+        application = bot_telegram.build_application()
+        await application.initialize()
+        await application.post_init(application)
+        await application.updater.start_polling(poll_interval=0, timeout=1, allowed_updates=bot_telegram.ALLOWED_UPDATES)
+        await application.start()
+
+    mix = MessageMix(args)
+    if args.bulk_links:
+        # Một file danh sách link gửi cùng lúc với tải thường (đo ảnh hưởng của chuyển đổi hàng loạt)
+        content = "\n".join(mix._link() for _ in range(args.bulk_links))
+        services.push_document(-1009999999999, 1, content, "links.txt", caption="qr" if args.bulk_qr else None)
+    total = int(args.rate * args.duration)
+    print(f"▶️  Gửi {total} tin nhắn ({args.rate}/s trong {args.duration}s) vào {args.chats} chat...")
+    started = time.perf_counter()
+    for index in range(total):
+        target = started + index / args.rate
+        delay = target - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, text = mix.next()
+        chat_id = -1000000000000 - random.randrange(args.chats)
+        services.push_message(chat_id, random.randrange(1, args.users + 1), text, kind)
+
+    deadline = time.perf_counter() + args.drain_timeout
+    while services.pending and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+    if args.workers:
+        stop_ingress.set()
+        await ingress
+    else:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+    await runner.cleanup()
+
+    report(args, services, stage_samples)
+
+    # Bot đã dừng hẳn → không được còn process spawn_main nào (QR pool, worker, process con của worker)
+    leftovers = leftover_processes(f"LOADTEST_PORT={port}")
+    if leftovers:
+        print(f"❌ Còn {len(leftovers)} process spawn_main sau khi bot dừng: {leftovers}")
+        return 1
+    print("✅ Không còn process spawn_main nào sau khi bot dừng")
+    return 0
+
+
+def leftover_processes(marker):
+    """PID các process spawn_main còn sống của lần chạy này (nhận diện qua biến môi trường `marker`)."""
+    if not os.path.isdir("/proc"):
+        return []  # chỉ kiểm tra được trên Linux
+    leftovers = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{name}/cmdline", "rb") as f:
+                cmdline = f.read()
+            with open(f"/proc/{name}/environ", "rb") as f:
+                environ = f.read().split(b"\0")
+        except OSError:
+            continue
+        if b"spawn_main" in cmdline and marker.encode() in environ:
+            leftovers.append(int(name))
+    return leftovers
+
+
+def report(args, services, stage_samples):
+    completed = sum(len(samples) for samples in services.latencies.values())
+    elapsed = (services.last_done or time.perf_counter()) - (services.first_sent or time.perf_counter())
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    print()
+    print(f"📨 Đã gửi: {services.sent}   ✅ Hoàn tất: {completed}   ⏳ Chưa xong: {len(services.pending)}")
+    print(f"🚀 Throughput: {completed / elapsed if elapsed > 0 else 0:.1f} tin nhắn/giây")
+    print(f"🧠 Peak RSS: bot {self_rss:.1f} MB, process con (QR/worker) {children_rss:.1f} MB")
+
+    print()
+    print(f"{'end-to-end (ms)':<22} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    all_samples = [value for samples in services.latencies.values() for value in samples]
+    for kind, samples in sorted(services.latencies.items()) + [("tất cả", all_samples)]:
+        print(f"{kind:<22} {len(samples):>6} {fmt_ms(percentile(samples, 0.5))} "
+              f"{fmt_ms(percentile(samples, 0.95))} {fmt_ms(percentile(samples, 0.99))}")
+
+    print()
+    print(f"{'stage (ms)':<22} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, samples in sorted(stage_samples.items()):
+        print(f"{stage:<22} {len(samples):>6} {fmt_ms(percentile(samples, 0.5))} "
+              f"{fmt_ms(percentile(samples, 0.95))} {fmt_ms(percentile(samples, 0.99))}")
+
+    print()
+    for name, content in services.documents:
+        print(f"📄 File bot gửi về: {name} ({len(content)} byte)")
+    print("📞 Request tới dịch vụ giả:", ", ".join(f"{name}={count}" for name, count in sorted(services.calls.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=20, help="tin nhắn/giây")
+    parser.add_argument("--duration", type=float, default=10, help="thời gian gửi (giây)")
+    parser.add_argument("--chats", type=int, default=50, help="số group/chat")
+    parser.add_argument("--users", type=int, default=500, help="số user")
+    parser.add_argument("--products", type=int, default=300, help="số sản phẩm khác nhau (ảnh hưởng tỉ lệ cache hit)")
+    parser.add_argument("--text-ratio", type=float, default=0.4, help="tỉ lệ tin nhắn text → QR")
+    parser.add_argument("--single-ratio", type=float, default=0.4, help="tỉ lệ tin nhắn 1 link")
+    parser.add_argument("--multi-ratio", type=float, default=0.2, help="tỉ lệ tin nhắn nhiều link")
+    parser.add_argument("--links-per-multi", type=int, default=5, help="số link trong tin nhắn nhiều link")
+    parser.add_argument("--bulk-links", type=int, default=0, help="gửi thêm một file .txt gồm N link (chuyển đổi hàng loạt)")
+    parser.add_argument("--bulk-qr", action="store_true", help="file hàng loạt yêu cầu kèm zip QR")
+    parser.add_argument("--bot-latency", type=float, default=30, help="độ trễ Bot API giả (ms)")
+    parser.add_argument("--bot-error-rate", type=float, default=0.0)
+    parser.add_argument("--accesstrade-latency", type=float, default=150, help="độ trễ AccessTrade giả (ms)")
+    parser.add_argument("--accesstrade-error-rate", type=float, default=0.0)
+    parser.add_argument("--redirect-latency", type=float, default=80, help="độ trễ mỗi hop redirect (ms)")
+    parser.add_argument("--redirect-error-rate", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=30, help="thời gian chờ xử lý nốt sau khi gửi xong (giây)")
+    parser.add_argument("--workers", type=int, default=0, help="chạy BOT_RUN_MODE=workers với N worker process (0 = một process)")
+    parser.add_argument("--port", type=int, default=0, help="port server giả (0 = tự chọn)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,57 @@
+# ⏱️ Import đầu tiên: đo thời gian khởi động (các module nặng được import lười, xem startup.py)
+from startup import startup_timer
 import logging
 import os
 import traceback
-from telegram import Update, InputFile
+from telegram import Update, InputFile, InputMediaPhoto
+from telegram.error import BadRequest
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
 import aiohttp
 import asyncio
-import qrcode
 import io
-import re
 import uuid
+import secrets
+import shutil
+import tempfile
 from config import TELEGRAM_BOT_TOKEN, ACCESSTRADE_TOKEN, BOT_INSTANCE_ID
+from http_client import http_client, start_http_client, close_http_client
+from shorten_batcher import ShortenBatcher
+from link_cache import LinkCache
+from link_classifier import classify_url, affiliate_links, normalize_link
+from bulk_convert import BulkJob, iter_document_links, iter_text_links
+from qr_cache import QRCache, qr_key
+from qr_engine import QREngine, render_qr_png
+from update_dedup import UpdateDeduplicator, update_key
+from singleflight import SingleFlight
+from campaign_registry import CampaignRegistry
+from scheduler import FairScheduler, SchedulerFull, TokenBucket
+from redirect_resolver import resolve_redirects, resolver_stats
+from ttl_cache import TTLCache, MISSING
+from config import EXPAND_CACHE_SIZE, EXPAND_CACHE_TTL, EXPAND_NEGATIVE_TTL, QR_PROCESS_WORKERS
+from config import DEDUP_WINDOW_SECONDS, DEDUP_MAX_ITEMS, DEDUP_SHARED_PATH, MESSAGE_LINK_CONCURRENCY
+from config import CAMPAIGN_REFRESH_INTERVAL, CAMPAIGN_NEGATIVE_TTL
+from config import (
+    ACCESSTRADE_RATE_PER_SEC, ACCESSTRADE_BURST,
+    SCHED_GLOBAL_CONCURRENCY, SCHED_CHAT_CONCURRENCY, SCHED_USER_CONCURRENCY, SCHED_CHAT_QUEUE_LIMIT,
+)
+from config import (
+    BOT_RUN_MODE, WORKER_PROCESSES, TELEGRAM_API_BASE_URL, TELEGRAM_FILE_BASE_URL, CONCURRENT_UPDATES,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+)
+from config import LOG_LEVEL, METRICS_HOST, METRICS_PORT, ACCESSTRADE_API_BASE, PROGRESS_PLACEHOLDER_DELAY_MS
+from config import BULK_MAX_FILE_BYTES, BULK_MAX_LINKS, BULK_CONCURRENCY, BULK_PROGRESS_INTERVAL
+from config import BULK_MAX_JOBS, BULK_QUEUE_LIMIT, BULK_QUOTA_RESERVE
+from logging_setup import setup_logging
+from metrics import registry, span, cache_events, fallbacks, errors, messages, MetricsServer
+from progress import ProgressPlaceholder
+from resilience import CircuitBreaker, CircuitOpen, ResiliencePolicy, UpstreamError
+from state_snapshot import StateSnapshot
+from config import STATE_SNAPSHOT_PATH, STATE_SNAPSHOT_MAX_AGE
+from config import (
+    BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_FAILURE_RATE, BREAKER_OPEN_SECONDS,
+    ACCESSTRADE_SLOW_CALL_SECONDS, EXPAND_SLOW_CALL_SECONDS,
+    RETRY_ATTEMPTS, RETRY_BASE_DELAY_MS, RETRY_MAX_DELAY_MS, HEDGE_ENABLED, HEDGE_MIN_DELAY_MS, HEDGE_MAX_DELAY_MS,
+)
 
 # 🆔 Unique bot instance identifier
 BOT_INSTANCE_ID = BOT_INSTANCE_ID or str(uuid.uuid4())[:8]
@@ -18,100 +60,216 @@ BOT_INSTANCE_ID = BOT_INSTANCE_ID or str(uuid.uuid4())[:8]
 TOKEN = TELEGRAM_BOT_TOKEN
 ACCESS_TOKEN = ACCESSTRADE_TOKEN
 
-# Cấu hình logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+# 📥 Chỉ nhận loại update bot thực sự xử lý (tin nhắn text và lệnh)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+# Cấu hình logging (qua QueueHandler, không chặn event loop)
+setup_logging(LOG_LEVEL)
+
+# 🕒 Lọc update đã xử lý (theo chat_id + message_id) để tránh xử lý trùng lặp
+processed_messages = UpdateDeduplicator(
+    window_seconds=DEDUP_WINDOW_SECONDS,
+    max_items=DEDUP_MAX_ITEMS,
+    shared_path=DEDUP_SHARED_PATH or None,
+)
+
+# 💾 Cache link affiliate (RAM + SQLite) theo URL sản phẩm đã chuẩn hoá
+link_cache = LinkCache()
+
+# 🖼️ Cache QR: file_id Telegram đã upload + byte PNG chưa upload
+qr_cache = QRCache()
+
+# 🖼️ Engine render QR trong process pool riêng
+qr_engine = QREngine(workers=QR_PROCESS_WORKERS)
+
+# 🚦 Scheduler công bằng giữa các chat + token bucket theo quota AccessTrade
+scheduler = FairScheduler(
+    global_limit=SCHED_GLOBAL_CONCURRENCY,
+    chat_limit=SCHED_CHAT_CONCURRENCY,
+    user_limit=SCHED_USER_CONCURRENCY,
+    chat_queue_limit=SCHED_CHAT_QUEUE_LIMIT,
+)
+accesstrade_bucket = TokenBucket(rate=ACCESSTRADE_RATE_PER_SEC, capacity=ACCESSTRADE_BURST)
+# 📦 Làn riêng cho chuyển đổi hàng loạt: không chiếm slot của tin nhắn tương tác, mỗi chat/user một việc
+bulk_scheduler = FairScheduler(
+    global_limit=BULK_MAX_JOBS,
+    chat_limit=1,
+    user_limit=1,
+    chat_queue_limit=BULK_QUEUE_LIMIT,
 )
 
-# 🕒 Lưu trữ ID các message đã xử lý để tránh xử lý trùng lặp
-processed_messages = set()  # Lưu trữ ID các message đã xử lý
+# 🔁 Cache kết quả expand (kể cả kết quả âm với TTL ngắn hơn) + gộp request đang chạy
+expand_cache = TTLCache(maxsize=EXPAND_CACHE_SIZE, ttl=EXPAND_CACHE_TTL)
+expand_flight = SingleFlight()
+
+# 🔌 Circuit breaker + retry có jitter + hedged request (chỉ cho GET) cho AccessTrade và expand link
+def make_policy(name, slow_call_seconds):
+    breaker = CircuitBreaker(
+        name,
+        window=BREAKER_WINDOW,
+        min_calls=BREAKER_MIN_CALLS,
+        failure_rate=BREAKER_FAILURE_RATE,
+        slow_call_threshold=slow_call_seconds,
+        open_seconds=BREAKER_OPEN_SECONDS,
+    )
+    return ResiliencePolicy(
+        breaker,
+        attempts=RETRY_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY_MS / 1000,
+        max_delay=RETRY_MAX_DELAY_MS / 1000,
+        hedge=HEDGE_ENABLED,
+        hedge_min_delay=HEDGE_MIN_DELAY_MS / 1000,
+        hedge_max_delay=HEDGE_MAX_DELAY_MS / 1000,
+    )
 
-# 💾 Cache campaign ID để tránh gọi API nhiều lần
-shopee_campaign_id_cache = None
+accesstrade_policy = make_policy("accesstrade", ACCESSTRADE_SLOW_CALL_SECONDS)
+expand_policy = make_policy("expand", EXPAND_SLOW_CALL_SECONDS)
 
 # 🔍 Mở rộng link rút gọn dạng shp.ee, vn.shp.ee hoặc s.shopee.vn (async)
 async def expand_url(short_url):
-    """Unshorten link bằng cách follow redirects - phiên bản đơn giản và nhanh"""
-    logging.info(f"🔗 [{BOT_INSTANCE_ID}] Đang expand: {short_url}")
+    """Unshorten link: trả từ cache, hoặc dùng chung request đang chạy cho cùng short URL"""
+    cached = expand_cache.get(short_url)
+    if cached is not MISSING:
+        cache_events.inc(cache="expand", result="hit")
+        logging.debug(f"💾 [{BOT_INSTANCE_ID}] Expand cache hit: {short_url}")
+        return cached
+    cache_events.inc(cache="expand", result="miss")
+    return await expand_flight.do(short_url, lambda: _expand_and_cache(short_url))
+
+async def _expand_and_cache(short_url):
+    with span("expand"):
+        try:
+            expanded = await _expand_url_uncached(short_url)
+        except CircuitOpen:
+            # Không cache: khi circuit đóng lại thì expand bình thường
+            return None
+    ttl = EXPAND_CACHE_TTL if expanded else EXPAND_NEGATIVE_TTL
+    expand_cache.set(short_url, expanded, ttl=ttl)
+    return expanded
+
+async def _expand_url_uncached(short_url):
+    """Unshorten link bằng cách follow header Location từng hop (không tải trang đích)"""
+    logging.debug(f"🔗 [{BOT_INSTANCE_ID}] Đang expand: {short_url}")
     
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1'
         }
         
-        # Timeout ngắn để không làm chậm bot
-        timeout = aiohttp.ClientTimeout(total=8, connect=4)
-        connector = aiohttp.TCPConnector(ssl=False)
+        # HEAD từng hop, dừng ngay khi tới host sản phẩm Shopee/Lazada (bảng HOSTS)
+        async def resolve():
+            resolved = await resolve_redirects(short_url, headers=headers, max_hops=15)
+            last_status = resolved.hops[-1][2] if resolved.hops else None
+            if last_status and last_status >= 500:
+                raise UpstreamError(f"HTTP {last_status} tại {resolved.final_url}")
+            return resolved
+
+        # HEAD/GET idempotent → được retry và hedge qua expand_policy
+        result = await expand_policy.call(resolve)
+        final_url = result.final_url
+        hop_latencies = ", ".join(f"{hop[3]}ms" for hop in result.hops)
+        logging.debug(f"↪️ [{BOT_INSTANCE_ID}] {result.hop_count} hop ({hop_latencies})")
         
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers, connector=connector) as session:
-            async with session.get(short_url, allow_redirects=True, max_redirects=15) as response:
-                final_url = str(response.url)
-                
-                # Kiểm tra xem đã redirect sang shopee.vn chưa
-                if "shopee.vn" in final_url:
-                    logging.info(f"✅ [{BOT_INSTANCE_ID}] Expand thành công: {final_url[:80]}...")
-                    return final_url
-                else:
-                    logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] URL không phải Shopee: {final_url[:80]}...")
-                    return None
+        # Kiểm tra xem đã redirect sang shopee.vn / lazada.vn chưa
+        if result.reached_target:
+            logging.debug(f"✅ [{BOT_INSTANCE_ID}] Expand thành công: {final_url[:80]}...")
+            return final_url
+        else:
+            logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] URL không phải Shopee/Lazada: {final_url[:80]}...")
+            return None
                     
+    except CircuitOpen:
+        raise
     except asyncio.TimeoutError:
         logging.warning(f"⏱️ [{BOT_INSTANCE_ID}] Timeout expand: {short_url}")
         return None
     except Exception as e:
         logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi expand: {type(e).__name__}: {e}")
+        errors.inc(platform="any", stage="expand")
         return None
 
 # 🔗 Rút gọn link qua AccessTrade (async)
-async def shorten_affiliate_link(original_url, platform="shopee"):
-    """Rút gọn link affiliate cho Shopee hoặc Lazada"""
-    print(f"🔗 Đang rút gọn {platform} link: {original_url}")
+async def shorten_affiliate_link(original_url, platform="shopee", batcher=None):
+    """Rút gọn link affiliate cho Shopee hoặc Lazada (batcher mặc định: shorten_batcher)"""
+    logging.debug(f"🔗 Đang rút gọn {platform} link: {original_url}")
     
     if platform == "shopee":
-        campaign_id = await get_shopee_campaign_id()
+        with span("campaign"):
+            campaign_id = await get_shopee_campaign_id()
     elif platform == "lazada":
-        campaign_id = await get_lazada_campaign_id()
+        with span("campaign"):
+            campaign_id = await get_lazada_campaign_id()
     else:
-        print(f"❌ Platform không hỗ trợ: {platform}")
+        logging.error(f"❌ Platform không hỗ trợ: {platform}")
         return None
     
     if not campaign_id:
-        print(f"❌ Không tìm thấy campaign_id cho {platform}")
+        logging.error(f"❌ Không tìm thấy campaign_id cho {platform}")
         return None
     
-    print(f"✅ Campaign ID cho {platform}: {campaign_id}")
+    logging.debug(f"✅ Campaign ID cho {platform}: {campaign_id}")
+
+    # Gom cùng các request đồng thời của cùng campaign thành một lần gọi API
+    with span("shorten", platform=platform):
+        short_link = await (batcher or shorten_batcher).submit(campaign_id, original_url)
+    if short_link:
+        logging.debug(f"✅ Rút gọn thành công: {short_link}")
+    return short_link
+
+# 🪣 Quota AccessTrade tính theo request: tin nhắn tương tác dùng cả bucket,
+# hàng loạt chỉ dùng phần vượt BULK_QUOTA_RESERVE (chừa lại cho tin nhắn tương tác)
+async def acquire_accesstrade_token():
+    await accesstrade_bucket.acquire()
+
+async def acquire_bulk_accesstrade_token():
+    await accesstrade_bucket.acquire(reserve=BULK_QUOTA_RESERVE * accesstrade_bucket.capacity)
+
+# 📦 Gọi product_link/create cho một batch URL (dùng bởi shorten_batcher)
+async def create_product_links(campaign_id, urls, acquire_token=acquire_accesstrade_token):
+    """Gửi nhiều URL trong một request qua accesstrade_policy (raise CircuitOpen khi circuit mở).
+
+    Token của lần gửi đầu đã được batcher trừ trước khi chốt batch (cả batch một token).
+    """
+    # Cùng URL + campaign luôn ra cùng link affiliate → được retry (mỗi lần retry trừ thêm một token).
+    # Không hedge POST: hedge chỉ dành cho GET expand/campaigns
+    return await accesstrade_policy.call(
+        lambda: _post_product_links(campaign_id, urls),
+        hedge=False,
+        on_retry=acquire_token,
+    )
+
+# 📦 Như create_product_links nhưng retry cũng chỉ dùng token vượt phần chừa lại cho tin nhắn tương tác
+async def create_bulk_product_links(campaign_id, urls):
+    return await create_product_links(campaign_id, urls, acquire_token=acquire_bulk_accesstrade_token)
 
-    url = "https://api.accesstrade.vn/v1/product_link/create"
+async def _post_product_links(campaign_id, urls):
+    """Trả về JSON của AccessTrade (None nếu lỗi 4xx, raise UpstreamError nếu 5xx)."""
+    url = f"{ACCESSTRADE_API_BASE}/v1/product_link/create"
     headers = {
         "Authorization": f"Token {ACCESS_TOKEN}",
         "Content-Type": "application/json"
     }
     data = {
         "campaign_id": campaign_id,
-        "urls": [original_url]
+        "urls": urls
     }
 
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            async with session.post(url, headers=headers, json=data) as response:
-                response_text = await response.text()
-                print(f"📊 API Response Status: {response.status}")
-                print(f"📊 API Response: {response_text}")
-                
-                if response.status == 200:
-                    json_data = await response.json()
-                    if json_data.get("success"):
-                        short_link = json_data["data"]["success_link"][0]["short_link"]
-                        print(f"✅ Rút gọn thành công: {short_link}")
-                        return short_link
-                    else:
-                        print(f"❌ API trả về success=false: {json_data}")
-                else:
-                    print(f"❌ API error {response.status}: {response_text}")
-    except Exception as e:
-        print(f"❌ Lỗi gọi API: {e}")
-    return None
+    async with http_client.post(url, profile="api", headers=headers, json=data) as response:
+        response_text = await response.text()
+        logging.debug(f"📊 API Response Status: {response.status} ({len(urls)} link)")
+        logging.debug(f"📊 API Response: {response_text[:500]}")
+        
+        if response.status == 200:
+            return await response.json()
+        logging.error(f"❌ API error {response.status}: {response_text[:300]}")
+        if response.status >= 500:
+            raise UpstreamError(f"HTTP {response.status}")
+        return None
+
+# 📦 Batcher dùng chung cho mọi lần rút gọn
+shorten_batcher = ShortenBatcher(create_product_links, acquire=acquire_accesstrade_token)
+# 📦 Batcher riêng cho chuyển đổi hàng loạt (ưu tiên quota thấp hơn tin nhắn tương tác)
+bulk_shorten_batcher = ShortenBatcher(create_bulk_product_links, acquire=acquire_bulk_accesstrade_token)
 
 # 🔗 Wrapper cho Shopee (để tương thích ngược)
 async def shorten_shopee_link(original_url):
@@ -121,87 +279,142 @@ async def shorten_shopee_link(original_url):
 async def shorten_lazada_link(original_url):
     return await shorten_affiliate_link(original_url, "lazada")
 
-# 💾 Cache cho campaign IDs
-lazada_campaign_id_cache = None
+# 📦 Tải danh sách campaign đã duyệt (một request cho mọi merchant)
+async def fetch_campaigns():
+    """Gọi /v1/campaigns qua accesstrade_policy, trả về danh sách campaign (raise nếu API lỗi)."""
+    return await accesstrade_policy.call(_fetch_campaigns_once)
 
-# 📦 Lấy campaign ID của Shopee (async + cache)
-async def get_shopee_campaign_id():
-    global shopee_campaign_id_cache
-    
-    # Trả về từ cache nếu đã có
-    if shopee_campaign_id_cache:
-        return shopee_campaign_id_cache
-    
-    url = "https://api.accesstrade.vn/v1/campaigns?approval=successful"
+async def _fetch_campaigns_once():
+    url = f"{ACCESSTRADE_API_BASE}/v1/campaigns?approval=successful"
     headers = {"Authorization": f"Token {ACCESS_TOKEN}"}
     
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    json_data = await response.json()
-                    for campaign in json_data["data"]:
-                        if campaign["merchant"] == "shopee":
-                            shopee_campaign_id_cache = campaign["id"]  # Cache lại
-                            return campaign["id"]
-    except:
-        pass
-    return None
-
-# 📦 Lấy campaign ID của Lazada (async + cache)
+    # SSL verify theo cấu hình SSL_VERIFY (profile "api" của http_client)
+    logging.debug("🌐 Đang gọi API campaigns...")
+    async with http_client.get(url, profile="api", headers=headers) as response:
+        logging.debug(f"📊 Campaign API Status: {response.status}")
+        if response.status != 200:
+            response_text = await response.text()
+            raise aiohttp.ClientResponseError(
+                response.request_info, response.history, status=response.status, message=response_text[:200]
+            )
+        json_data = await response.json()
+        return json_data["data"]
+
+# 💾 Registry campaign ID: tải một lần, làm mới nền theo TTL, cache cả kết quả âm
+campaign_registry = CampaignRegistry(
+    fetch_campaigns,
+    refresh_interval=CAMPAIGN_REFRESH_INTERVAL,
+    negative_ttl=CAMPAIGN_NEGATIVE_TTL,
+)
+
+# 📦 Lấy campaign ID của Shopee (qua registry)
+async def get_shopee_campaign_id():
+    return await campaign_registry.get("shopee")
+
+# 📦 Lấy campaign ID của Lazada (qua registry)
 async def get_lazada_campaign_id():
-    global lazada_campaign_id_cache
-    
-    # Trả về từ cache nếu đã có
-    if lazada_campaign_id_cache:
-        print(f"📦 Sử dụng cached Lazada campaign ID: {lazada_campaign_id_cache}")
-        return lazada_campaign_id_cache
-    
-    url = "https://api.accesstrade.vn/v1/campaigns?approval=successful"
-    headers = {"Authorization": f"Token {ACCESS_TOKEN}"}
+    return await campaign_registry.get("lazada")
+
+# 🖼️ Tạo mã QR (PNG 1-bit, tham số theo độ dài nội dung - xem qr_engine)
+def generate_qr_code(url):
+    return io.BytesIO(render_qr_png(url))
+
+# 🖼️ Lấy byte PNG của QR (từ cache hoặc render mới)
+async def get_qr_png(content, key):
+    png = qr_cache.get_png(key)
+    if png is None:
+        # Tạo QR code (chạy trong process pool để không block event loop)
+        with span("qr_render"):
+            png = await qr_engine.render(content)
+        qr_cache.renders += 1
+        qr_cache.put_png(key, png)
+    return png
+
+# 📎 BadRequest do file_id cache không còn dùng được (khác lỗi caption/Markdown → không xoá file_id)
+STALE_FILE_ID_ERRORS = ("file identifier", "file_id", "file reference", "file_reference", "media_empty")
+
+def is_stale_file_id_error(error):
+    text = str(error).lower()
+    return any(marker in text for marker in STALE_FILE_ID_ERRORS)
+
+# 📤 Gửi QR: dùng lại file_id đã upload, chỉ render + upload khi chưa có
+async def reply_qr(message, content, caption, parse_mode='Markdown'):
+    """Trả lời bằng ảnh QR của content, ưu tiên file_id đã cache."""
+    key = qr_key(content)
     
-    try:
-        # SSL verification - enable for production, disable for development
-        ssl_verify = os.getenv('SSL_VERIFY', 'true').lower() == 'true'
-        connector = aiohttp.TCPConnector(ssl=ssl_verify)
-        timeout = aiohttp.ClientTimeout(total=10, connect=5)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            print("🌐 Đang gọi API campaigns...")
-            async with session.get(url, headers=headers) as response:
-                response_text = await response.text()
-                print(f"📊 Campaign API Status: {response.status}")
-                
-                if response.status == 200:
-                    json_data = await response.json()
-                    merchants = [c['merchant'] for c in json_data['data']]
-                    print(f"📋 Tìm thấy {len(merchants)} campaigns: {merchants}")
-                    
-                    for campaign in json_data["data"]:
-                        merchant_name = campaign["merchant"]
-                        if merchant_name in ["lazadacps", "lazada"]:  # Try both names
-                            lazada_campaign_id_cache = campaign["id"]
-                            print(f"✅ Tìm thấy Lazada campaign ID: {campaign['id']} (merchant: {merchant_name})")
-                            return campaign["id"]
-                    
-                    print("❌ Không tìm thấy campaign Lazada/lazadacps trong danh sách")
-                else:
-                    print(f"❌ Lỗi API campaigns {response.status}: {response_text}")
-                    
-    except aiohttp.ClientError as e:
-        print(f"❌ Lỗi kết nối API campaigns: {e}")
-    except Exception as e:
-        print(f"❌ Lỗi không xác định API campaigns: {e}")
+    file_id = qr_cache.get_file_id(key)
+    cache_events.inc(cache="qr_file_id", result="hit" if file_id else "miss")
+    if file_id:
+        try:
+            with span("telegram_upload", kind="file_id"):
+                return await message.reply_photo(
+                    photo=file_id,
+                    caption=caption,
+                    parse_mode=parse_mode,
+                    reply_to_message_id=message.message_id
+                )
+        except BadRequest as e:
+            if not is_stale_file_id_error(e):
+                raise
+            # file_id không còn hợp lệ → upload lại
+            logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] file_id QR không dùng được ({e}), upload lại")
+            qr_cache.forget_file_id(key)
     
-    return None
+    png = await get_qr_png(content, key)
+    with span("telegram_upload", kind="photo"):
+        sent = await message.reply_photo(
+            photo=InputFile(io.BytesIO(png), filename="qrcode.png"),
+            caption=caption,
+            parse_mode=parse_mode,
+            reply_to_message_id=message.message_id
+        )
+    if sent and sent.photo:
+        qr_cache.set_file_id(key, sent.photo[-1].file_id)
+    return sent
 
-# 🖼️ Tạo mã QR
-def generate_qr_code(url):
-    qr = qrcode.make(url)
-    buffer = io.BytesIO()
-    qr.save(buffer, format="PNG")
-    buffer.seek(0)
-    return buffer
+# 📤 Gửi một album QR; file_ids[i] = None → render + upload ảnh đó
+async def send_qr_album(message, chunk, keys, file_ids, start):
+    pngs = await asyncio.gather(*(
+        get_qr_png(content, key)
+        for (content, _), key, file_id in zip(chunk, keys, file_ids) if not file_id
+    ))
+    pngs = iter(pngs)
+    media = [
+        InputMediaPhoto(
+            media=file_id or InputFile(io.BytesIO(next(pngs)), filename=f"qrcode_{start + index}.png"),
+            caption=caption,
+        )
+        for index, ((_, caption), file_id) in enumerate(zip(chunk, file_ids))
+    ]
+    with span("telegram_upload", kind="media_group"):
+        sent = await message.reply_media_group(media=media, reply_to_message_id=message.message_id)
+    for key, file_id, sent_message in zip(keys, file_ids, sent):
+        if not file_id and sent_message.photo:
+            qr_cache.set_file_id(key, sent_message.photo[-1].file_id)
+
+# 📤 Gửi nhiều QR dưới dạng album (tối đa 10 ảnh/album theo giới hạn Telegram)
+async def reply_qr_group(message, items):
+    """items: danh sách (content, caption). Dùng lại file_id đã cache cho từng QR."""
+    for start in range(0, len(items), 10):
+        chunk = items[start:start + 10]
+        if len(chunk) == 1:
+            # Caption của album là text thường (link gốc có "_" như sp_atk=) → không parse Markdown
+            await reply_qr(message, *chunk[0], parse_mode=None)
+            continue
+
+        keys = [qr_key(content) for content, _ in chunk]
+        file_ids = [qr_cache.get_file_id(key) for key in keys]
+        try:
+            await send_qr_album(message, chunk, keys, file_ids, start)
+        except BadRequest as e:
+            if not any(file_ids) or not is_stale_file_id_error(e):
+                raise
+            # Không biết file_id nào hỏng → xoá các file_id của album này và upload lại cả album
+            logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] file_id QR trong album không dùng được ({e}), upload lại")
+            for key, file_id in zip(keys, file_ids):
+                if file_id:
+                    qr_cache.forget_file_id(key)
+            await send_qr_album(message, chunk, keys, [None] * len(chunk), start)
 
 # ✅ Lệnh bắt đầu
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -210,6 +423,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     welcome_text += f"🆔 Bot Instance: {BOT_INSTANCE_ID}\n\n"
     welcome_text += "🎮 **Lệnh khả dụng:**\n"
     welcome_text += "• `/rutgon <link>` - Rút gọn link thủ công\n"
+    welcome_text += "• `/rutgon` + nhiều link (thêm `qr` để kèm zip QR) - Chuyển đổi hàng loạt, trả về CSV\n"
+    welcome_text += "• **Gửi file .txt/.csv** - Chuyển đổi hàng loạt (caption `qr` để kèm zip QR)\n"
     welcome_text += "• `/status` - Kiểm tra trạng thái bot\n"
     welcome_text += "• **Gửi bất kỳ gì** - Tạo QR code\n\n"
     welcome_text += "🛒 **Tính năng đặc biệt:**\n"
@@ -218,7 +433,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     welcome_text += "💡 Chỉ cần gửi bất kỳ nội dung gì, bot sẽ tạo QR code cho bạn!"
     
     await update.message.reply_text(welcome_text, parse_mode='Markdown', reply_to_message_id=update.message.message_id)
-    print(f'✅ [{BOT_INSTANCE_ID}] Bot đã được khởi động bởi user: {update.effective_user.first_name}')
+    logging.info(f'✅ [{BOT_INSTANCE_ID}] Bot đã được khởi động bởi user: {update.effective_user.first_name}')
 
 # ✅ Lệnh thủ công: /rutgon <link>
 async def rutgon(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -228,7 +443,106 @@ async def rutgon(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
     
     link = ' '.join(context.args)
-    await process_link(update, link)
+    # Nhiều link (mỗi link một dòng hoặc cách nhau bởi dấu cách) → chuyển đổi hàng loạt, trả về CSV
+    parts = update.message.text.split(maxsplit=1)
+    text = parts[1] if len(parts) > 1 else ""
+    if len(affiliate_links(text)) > 1:
+        with_qr = any(arg.lower() == "qr" for arg in context.args)
+        await run_bulk_scheduled(update, lambda: run_bulk(update, lambda: iter_text_links(text), "rutgon", with_qr))
+        return
+    await run_scheduled(update, lambda: process_link(update, link))
+
+# 📦 Chuyển đổi hàng loạt: nhận file .txt/.csv chứa danh sách link
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Nhận file danh sách link, trả về CSV link gốc → link affiliate (caption "qr" để kèm zip QR)."""
+    message = update.message
+    if not message or not message.document:
+        return
+    if processed_messages.is_duplicate(update_key(update)):
+        return
+    await run_bulk_scheduled(update, lambda: process_bulk_document(update))
+
+async def process_bulk_document(update: Update) -> None:
+    document = update.message.document
+    if document.file_size and document.file_size > BULK_MAX_FILE_BYTES:
+        await update.message.reply_text(
+            f"❌ File quá lớn (tối đa {BULK_MAX_FILE_BYTES // 1024} KB).",
+            reply_to_message_id=update.message.message_id,
+        )
+        return
+
+    name = document.file_name or "links.txt"
+    workdir = tempfile.mkdtemp(prefix="bulk-")
+    try:
+        # Tải file xuống đĩa rồi đọc từng dòng (RAM không tăng theo kích thước file)
+        path = os.path.join(workdir, "input.csv" if name.lower().endswith(".csv") else "input.txt")
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+        with_qr = "qr" in (update.message.caption or "").lower().split()
+        await run_bulk(update, lambda: iter_document_links(path), os.path.splitext(name)[0], with_qr, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+async def run_bulk(update: Update, make_records, name: str, with_qr: bool, workdir: str = None) -> None:
+    """Chuyển đổi mọi link từ `make_records()`, sửa tin tiến độ định kỳ, gửi CSV (+ zip QR)."""
+    message = update.message
+    total = sum(1 for _ in make_records())
+    if not total:
+        await message.reply_text("❌ Không tìm thấy link nào.", reply_to_message_id=message.message_id)
+        return
+    if total > BULK_MAX_LINKS:
+        await message.reply_text(f"❌ Quá nhiều link ({total}), tối đa {BULK_MAX_LINKS} link mỗi lần.",
+                                 reply_to_message_id=message.message_id)
+        return
+
+    logging.info(f"📦 [{BOT_INSTANCE_ID}] Chuyển đổi hàng loạt {total} link (QR: {with_qr})")
+    status_message = await message.reply_text(f"📦 Đang chuyển đổi {total} link...", reply_to_message_id=message.message_id)
+    last_text = None
+
+    async def report(stats):
+        nonlocal last_text
+        text = (f"📦 Đang chuyển đổi: {stats.done}/{stats.total} link\n"
+                f"✅ {stats.ok}  ⚠️ {stats.fallback}  ❌ {stats.error}  ⏭️ {stats.skipped}")
+        if text != last_text:
+            last_text = text
+            await status_message.edit_text(text)
+
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="bulk-")
+    try:
+        csv_path = os.path.join(workdir, f"{name}_affiliate.csv")
+        zip_path = os.path.join(workdir, f"{name}_qr.zip") if with_qr else None
+        job = BulkJob(
+            convert=lambda record: convert_affiliate_link(record.url, record.platform, bulk=True),
+            render_qr=qr_engine.render if with_qr else None,
+            concurrency=BULK_CONCURRENCY,
+            progress=report,
+            progress_interval=BULK_PROGRESS_INTERVAL,
+        )
+        with span("bulk"):
+            stats = await job.run(make_records(), csv_path, zip_path, total=total)
+        messages.inc(kind="bulk")
+
+        summary = (f"✅ Xong {stats.done} link trong {stats.elapsed:.0f}s\n"
+                   f"✅ {stats.ok} affiliate  ⚠️ {stats.fallback} link gốc  ❌ {stats.error} lỗi  ⏭️ {stats.skipped} bỏ qua")
+        await status_message.edit_text(summary)
+        with open(csv_path, "rb") as f:
+            await message.reply_document(document=f, filename=os.path.basename(csv_path),
+                                         reply_to_message_id=message.message_id)
+        if zip_path:
+            with open(zip_path, "rb") as f:
+                await message.reply_document(document=f, filename=os.path.basename(zip_path),
+                                             reply_to_message_id=message.message_id)
+    except Exception as e:
+        logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi chuyển đổi hàng loạt: {type(e).__name__}: {e}")
+        errors.inc(platform="bulk", stage="bulk")
+        await status_message.edit_text(f"❌ Lỗi chuyển đổi hàng loạt: {type(e).__name__}")
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+# 🔌 Nhãn trạng thái circuit (tránh dấu "_" làm hỏng Markdown)
+CIRCUIT_STATE_LABELS = {"closed": "🟢 đóng", "open": "🔴 mở", "half_open": "🟡 đang thử lại"}
 
 # 📊 Lệnh kiểm tra trạng thái bot
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -239,6 +553,39 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     status_text += f"🔗 **Affiliate links**: ✅ Hoạt động\n"
     status_text += f"🎯 **Tạo QR code**: ✅ Hoạt động\n"
     
+    sched_stats = scheduler.stats()
+    status_text += f"🚦 **Hàng đợi**: {sched_stats['active']} đang chạy, {sched_stats['queue_depth']} đang chờ"
+    status_text += f" (chờ TB {sched_stats['avg_wait_ms']}ms, max {sched_stats['max_wait_ms']}ms)\n"
+    bulk_stats = bulk_scheduler.stats()
+    status_text += f"📦 **Hàng loạt**: {bulk_stats['active']} đang chạy, {bulk_stats['queue_depth']} đang chờ, {bulk_stats['dropped']} lần báo bận\n"
+    status_text += f"🪣 **Quota AccessTrade**: còn {accesstrade_bucket.tokens:.0f} token, {accesstrade_bucket.rejected} lần fallback\n"
+    campaign_stats = campaign_registry.stats()
+    campaigns = ", ".join(f"{platform}={cid or '❌'}" for platform, cid in campaign_stats['campaigns'].items())
+    status_text += f"📋 **Campaign**: {campaigns or 'chưa tải'} (tải {campaign_stats['fetches']} lần)\n"
+    batch_stats = shorten_batcher.stats()
+    bulk_batch_stats = bulk_shorten_batcher.stats()
+    status_text += f"📦 **Batch rút gọn**: {batch_stats['batches']} batch / {batch_stats['links']} link"
+    status_text += f" (TB {batch_stats['avg_batch_size']} link/batch; hàng loạt {bulk_batch_stats['batches']} batch / {bulk_batch_stats['links']} link)\n"
+    cache_stats = link_cache.stats()
+    status_text += f"💾 **Link cache**: {cache_stats['hits']} hit / {cache_stats['misses']} miss\n"
+    expand_stats = expand_cache.stats()
+    status_text += f"🔁 **Expand cache**: {expand_stats['hits']} hit / {expand_stats['misses']} miss"
+    status_text += f", gộp {expand_flight.shared} request trùng\n"
+    qr_stats = qr_cache.stats()
+    status_text += f"🖼️ **QR cache**: {qr_stats['file_id_hits']} lần dùng lại file ID, {qr_stats['renders']} lần render\n"
+    for policy in (accesstrade_policy, expand_policy):
+        policy_stats = policy.stats()
+        status_text += f"🔌 **Circuit {policy.breaker.name}**: {CIRCUIT_STATE_LABELS[policy_stats['state']]}"
+        status_text += f" (lỗi {policy_stats['failure_rate']:.0%}, mở {policy_stats['trips']} lần, bỏ qua {policy_stats['rejected']} lời gọi"
+        status_text += f", p95 {policy_stats['p95_ms'] if policy_stats['p95_ms'] is not None else '-'}ms"
+        status_text += f", retry {policy_stats['retries']}, hedge {policy_stats['hedge_wins']}/{policy_stats['hedges']})\n"
+    resolve_stats = resolver_stats.snapshot()
+    startup_stats = startup_timer.stats()
+    # Tên phase (startup_timer.mark) không chứa dấu "_" để không làm hỏng Markdown
+    status_text += f"⏱️ **Khởi động**: {startup_stats['total_ms']}ms"
+    status_text += f" ({', '.join(f'{name} {ms}ms' for name, ms in startup_stats['phases_ms'].items())})\n"
+    status_text += f"↪️ **Redirect**: TB {resolve_stats['avg_hops']} hop, {resolve_stats['avg_hop_latency_ms']}ms/hop\n"
+    
     status_text += f"\n🛒 **Hỗ trợ platforms:**\n"
     status_text += f"• **Shopee** - Rút gọn affiliate + QR\n"
     status_text += f"• **Lazada** - Rút gọn affiliate + QR\n"
@@ -259,214 +606,397 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not message or not message.text:
         return
 
-    # Cleanup processed_messages để tránh tốn bộ nhớ (giữ lại 1000 message gần nhất)
-    if len(processed_messages) > 1000:
-        # Xóa 500 message cũ nhất (giả sử ID nhỏ hơn là cũ hơn)
-        old_messages = sorted(processed_messages)[:500]
-        for old_id in old_messages:
-            processed_messages.discard(old_id)
-        print(f"🧹 [{BOT_INSTANCE_ID}] Đã dọn dẹp {len(old_messages)} message cũ")
-
-    # Kiểm tra xem message đã được xử lý chưa
-    if message.message_id in processed_messages:
-        print(f"⚠️ [{BOT_INSTANCE_ID}] Message {message.message_id} đã được xử lý, bỏ qua")
+    # Kiểm tra + đánh dấu message đã xử lý (tự dọn theo cửa sổ thời gian, O(1))
+    if processed_messages.is_duplicate(update_key(update)):
+        logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] Message {message.chat_id}:{message.message_id} đã được xử lý, bỏ qua")
         return
     
-    # Đánh dấu message đã xử lý
-    processed_messages.add(message.message_id)
-    print(f"📨 [{BOT_INSTANCE_ID}] Nhận tin nhắn mới {message.message_id} từ {message.from_user.first_name}: {message.text}")
-    
-    # Tìm link Shopee/Lazada trong tin nhắn
-    shopee_pattern = r'(https?://(?:shopee\.vn|shp\.ee|vn\.shp\.ee|s\.shopee\.vn)/\S+)'
-    lazada_pattern = r'(https?://(?:lazada\.vn|www\.lazada\.vn|lzd\.co|m\.lazada\.vn|s\.lazada\.vn)/\S+)'
+    logging.debug(f"📨 [{BOT_INSTANCE_ID}] Nhận tin nhắn mới {message.message_id} từ {message.from_user.first_name}: {message.text}")
+    with span("handle_message"):
+        await run_scheduled(update, lambda: dispatch_message(update))
+
+# 🚦 Chạy việc qua scheduler công bằng (giới hạn theo chat/user, chia lượt giữa các chat)
+async def run_scheduled(update: Update, job) -> None:
+    """Chờ tới lượt của chat rồi chạy `job()`; bỏ qua nếu hàng đợi của chat đã đầy."""
+    message = update.message
+    user_id = message.from_user.id if message.from_user else None
+    try:
+        async with scheduler.slot(message.chat_id, user_id) as waited:
+            if waited > 1:
+                logging.info(f"🚦 [{BOT_INSTANCE_ID}] Chat {message.chat_id} chờ {waited:.1f}s tới lượt")
+            await job()
+    except SchedulerFull:
+        logging.warning(f"🚦 [{BOT_INSTANCE_ID}] Chat {message.chat_id} có quá nhiều yêu cầu đang chờ, bỏ qua message {message.message_id}")
+
+# 📦 Chạy việc hàng loạt trong làn riêng (không giữ slot của scheduler tương tác)
+async def run_bulk_scheduled(update: Update, job) -> None:
+    """Chờ tới lượt trong bulk_scheduler rồi chạy `job()`; báo bận nếu hàng đợi hàng loạt đã đầy."""
+    message = update.message
+    user_id = message.from_user.id if message.from_user else None
+    try:
+        async with bulk_scheduler.slot(message.chat_id, user_id) as waited:
+            if waited > 1:
+                logging.info(f"📦 [{BOT_INSTANCE_ID}] Chat {message.chat_id} chờ {waited:.1f}s tới lượt chuyển đổi hàng loạt")
+            await job()
+    except SchedulerFull:
+        logging.warning(f"📦 [{BOT_INSTANCE_ID}] Chat {message.chat_id} đã có việc hàng loạt đang chờ, bỏ qua message {message.message_id}")
+        await message.reply_text("⏳ Bạn đang có một lượt chuyển đổi hàng loạt chờ xử lý, vui lòng thử lại sau khi xong.",
+                                 reply_to_message_id=message.message_id)
+
+# 🔀 Phân loại nội dung tin nhắn và xử lý
+async def dispatch_message(update: Update) -> None:
+    """Rút gọn affiliate link nếu có, ngược lại tạo QR cho nội dung."""
+    message = update.message
     
-    shopee_matches = re.findall(shopee_pattern, message.text)
-    lazada_matches = re.findall(lazada_pattern, message.text)
+    # Tìm link Shopee/Lazada trong tin nhắn (một lần quét, bỏ trùng theo sản phẩm)
+    with span("classify"):
+        links = [(record.url, record.platform) for record in affiliate_links(message.text)]
     
-    print(f"🔍 [{BOT_INSTANCE_ID}] Tìm thấy Shopee: {len(shopee_matches)}, Lazada: {len(lazada_matches)}")
+    logging.debug(f"🔍 [{BOT_INSTANCE_ID}] Tìm thấy {len(links)} link Shopee/Lazada")
     
     # Ưu tiên xử lý affiliate links trước
-    if shopee_matches:
-        link = shopee_matches[0]  # Lấy link đầu tiên
-        print(f"🛒 [{BOT_INSTANCE_ID}] Xử lý Shopee affiliate: {link}")
-        await process_affiliate_link(update, link, "shopee")
-    elif lazada_matches:
-        link = lazada_matches[0]  # Lấy link đầu tiên
-        print(f"🛒 [{BOT_INSTANCE_ID}] Xử lý Lazada affiliate: {link}")
-        await process_affiliate_link(update, link, "lazada")
+    if len(links) == 1:
+        link, platform = links[0]
+        messages.inc(kind="affiliate")
+        logging.debug(f"🛒 [{BOT_INSTANCE_ID}] Xử lý {platform.title()} affiliate: {link}")
+        await process_affiliate_link(update, link, platform)
+    elif links:
+        # Nhiều link → xử lý đồng thời, trả về một lần
+        messages.inc(kind="multi_link")
+        await process_affiliate_links(update, links)
     else:
         # Không phải affiliate link → Tạo QR cho bất kỳ nội dung gì
-        print(f"🎯 [{BOT_INSTANCE_ID}] Tạo QR cho nội dung: {message.text}")
+        messages.inc(kind="qr")
+        logging.debug(f"🎯 [{BOT_INSTANCE_ID}] Tạo QR cho nội dung: {message.text}")
         await create_qr_for_content(update, message.text)
 
-# 🛒 Xử lý affiliate link (Shopee/Lazada)
-async def process_affiliate_link(update: Update, link: str, platform: str) -> None:
-    """Xử lý affiliate link: mở rộng, rút gọn và tạo QR code."""
-    print(f"🔧 [{BOT_INSTANCE_ID}] process_affiliate_link được gọi với {platform}: {link}")
-    
-    # Gửi thông báo đang xử lý
-    processing_message = await update.message.reply_text(f"🛒 [{BOT_INSTANCE_ID}] Đang xử lý {platform.title()} link...")
+# ⏳ Placeholder "đang xử lý" thích ứng (chỉ gửi khi việc chạy lâu hơn ngưỡng)
+def progress_placeholder(message, text):
+    return ProgressPlaceholder(message, text, delay=PROGRESS_PLACEHOLDER_DELAY_MS / 1000)
 
-    # CHỈ unshorten link s.shopee.vn (vn.shp.ee và shp.ee gửi trực tiếp cho API)
-    unshortened_link = None
-    
-    if platform == "shopee" and "s.shopee.vn" in link:
-        print(f"🔗 [{BOT_INSTANCE_ID}] Đang unshorten s.shopee.vn: {link}")
+# 🛒 Kết quả xử lý một affiliate link
+class LinkResult:
+    """Kết quả convert: status = "ok" | "fallback" (QR link gốc) | "error"."""
+
+    def __init__(self, link, platform):
+        self.original_link = link
+        self.link = link
+        self.platform = platform
+        self.status = "error"
+        self.short_link = None
+        self.unshortened_link = None
+        self.error_text = None
+        self.fallback_reason = None
+
+# 🛒 Mở rộng + rút gọn một affiliate link (không gửi gì lên Telegram)
+async def convert_affiliate_link(link: str, platform: str, bulk: bool = False) -> LinkResult:
+    """Convert link Shopee/Lazada thành link affiliate, có dùng cache.
+
+    bulk=True: chuyển đổi hàng loạt - chờ token AccessTrade (phần vượt BULK_QUOTA_RESERVE) thay vì fallback ngay.
+    """
+    result = await _convert_affiliate_link(link, platform, bulk)
+    if result.status == "error":
+        errors.inc(platform=platform, stage="convert")
+    elif result.status == "fallback":
+        fallbacks.inc(platform=platform, reason=result.fallback_reason)
+    return result
+
+async def _convert_affiliate_link(link: str, platform: str, bulk: bool) -> LinkResult:
+    result = LinkResult(link, platform)
+
+    # Tra cache trước: cache hit trả lời ngay, không cần expand/gọi API
+    cached = link_cache.get(platform, link)
+    cache_events.inc(cache="link", result="hit" if cached else "miss")
+    if cached:
+        result.short_link, result.unshortened_link = cached
+        result.status = "ok"
+        logging.debug(f"💾 [{BOT_INSTANCE_ID}] Cache hit {platform}: {link} → {result.short_link}")
+        return result
+
+    # Phân loại theo host (không so khớp chuỗi con: "shp.ee" không khớp nhầm "vn.shp.ee" hay query string)
+    record = classify_url(link)
+    if record is None or record.platform != platform:
+        result.error_text = f"❌ Link {platform.title()} không hợp lệ!"
+        return result
+
+    # CHỈ unshorten s.shopee.vn, s.lazada.vn, lzd.co (vn.shp.ee và shp.ee gửi trực tiếp cho API)
+    if record.needs_expansion:
+        logging.debug(f"🔗 [{BOT_INSTANCE_ID}] Đang unshorten {record.host}: {link}")
         expanded = await expand_url(link)
-        print(f"📊 [{BOT_INSTANCE_ID}] Kết quả expand: {expanded}")
+        logging.debug(f"📊 [{BOT_INSTANCE_ID}] Kết quả expand: {expanded}")
         
         if not expanded:
-            error_msg = f"❌ Không thể unshorten link!\n\nLink gốc: {link}\n\nVui lòng thử lại hoặc kiểm tra link có hợp lệ không."
-            await processing_message.edit_text(error_msg)
-            return
+            if expand_policy.breaker.is_open:
+                return circuit_fallback(result, "expand")
+            result.error_text = f"❌ Không thể unshorten link!\n\nLink gốc: {link}\n\nVui lòng thử lại hoặc kiểm tra link có hợp lệ không."
+            return result
         
-        if "shopee.vn" not in expanded:
-            error_msg = f"❌ Link sau khi unshorten không phải Shopee!\n\nLink gốc: {link}\nLink sau unshorten: {expanded}"
-            print(f"⚠️ [{BOT_INSTANCE_ID}] {error_msg}")
-            await processing_message.edit_text(error_msg)
-            return
+        expanded_record = classify_url(expanded)
+        if expanded_record is None or expanded_record.platform != platform:
+            result.error_text = f"❌ Link sau khi unshorten không phải {platform.title()}!\n\nLink gốc: {link}\nLink sau unshorten: {expanded}"
+            logging.warning(f"⚠️ [{BOT_INSTANCE_ID}] {result.error_text}")
+            return result
         
-        unshortened_link = expanded
+        result.unshortened_link = expanded
         link = expanded
-        print(f"✅ [{BOT_INSTANCE_ID}] Link đã unshorten thành công: {unshortened_link}")
-    elif platform == "shopee" and ("vn.shp.ee" in link or "shp.ee" in link):
+        logging.debug(f"✅ [{BOT_INSTANCE_ID}] Link đã unshorten thành công: {expanded}")
+    elif record.is_short:
         # Link vn.shp.ee hoặc shp.ee → gửi trực tiếp cho API AccessTrade
-        print(f"📤 [{BOT_INSTANCE_ID}] Link {link} sẽ được gửi trực tiếp cho API AccessTrade (không cần unshorten)")
-    elif platform == "lazada" and ("lzd.co" in link or "s.lazada.vn" in link):
-        expanded = await expand_url(link)
-        if not expanded or "lazada.vn" not in expanded:
-            await processing_message.edit_text("❌ Không thể mở rộng link rút gọn hoặc không phải Lazada!")
-            return
-        link = expanded
+        logging.debug(f"📤 [{BOT_INSTANCE_ID}] Link {link} sẽ được gửi trực tiếp cho API AccessTrade (không cần unshorten)")
 
-    # Kiểm tra tính hợp lệ (cho phép link rút gọn Shopee như vn.shp.ee, shp.ee)
-    if platform == "shopee":
-        valid_shopee_domains = ["shopee.vn", "vn.shp.ee", "shp.ee", "s.shopee.vn"]
-        if not any(domain in link for domain in valid_shopee_domains):
-            await processing_message.edit_text("❌ Link Shopee không hợp lệ!")
-            return
-    elif platform == "lazada" and not any(domain in link for domain in ["lazada.vn", "www.lazada.vn", "lzd.co", "s.lazada.vn"]):
-        await processing_message.edit_text("❌ Link Lazada không hợp lệ!")
-        return
+    result.link = link
+
+    # AccessTrade đang lỗi/chậm (circuit mở) → QR link gốc ngay, không chờ timeout
+    if accesstrade_policy.breaker.is_open:
+        return circuit_fallback(result, "accesstrade")
+
+    # Hết quota AccessTrade → dùng ngay QR link gốc thay vì chờ (hàng loạt thì chờ token khi gửi batch).
+    # Chỉ kiểm tra, không trừ token: token được trừ một lần cho mỗi request product_link/create
+    if not bulk and not accesstrade_bucket.available():
+        logging.warning(f"🚦 [{BOT_INSTANCE_ID}] Hết quota AccessTrade, tạo QR cho link gốc: {link}")
+        result.status = "fallback"
+        result.fallback_reason = "rate_limited"
+        return result
 
     # Rút gọn link affiliate
-    short_link = await shorten_affiliate_link(link, platform)
+    short_link = await shorten_affiliate_link(link, platform, bulk_shorten_batcher if bulk else shorten_batcher)
     if not short_link:
-        # Nếu không rút gọn được → Tạo QR cho link gốc và thông báo
-        print(f"⚠️ Không rút gọn được {platform}, tạo QR cho link gốc")
-        await processing_message.edit_text(f"⚠️ Không thể rút gọn {platform.title()} link. Tạo QR cho link gốc...")
-        
-        # Tạo QR cho link gốc
-        loop = asyncio.get_event_loop()
-        qr_image = await loop.run_in_executor(None, generate_qr_code, link)
-        
-        result_text = f"⚠️ QR của {platform.title()} link gốc:\n{link}"
+        # Không rút gọn được → dùng QR cho link gốc
+        logging.warning(f"⚠️ Không rút gọn được {platform}, tạo QR cho link gốc")
+        result.status = "fallback"
+        result.fallback_reason = "shorten_failed"
+        return result
+
+    result.short_link = short_link
+    result.status = "ok"
+
+    # Lưu cache theo cả link gốc và link đã expand
+    link_cache.set(platform, result.original_link, short_link, result.unshortened_link)
+    if link != result.original_link:
+        link_cache.set(platform, link, short_link, result.unshortened_link)
+    return result
+
+# 🔌 Circuit của dịch vụ đang mở → fallback QR link gốc
+def circuit_fallback(result: LinkResult, service: str) -> LinkResult:
+    logging.warning(f"🔌 [{BOT_INSTANCE_ID}] Circuit {service} đang mở, tạo QR cho link gốc: {result.link}")
+    result.status = "fallback"
+    result.fallback_reason = f"{service}_circuit_open"
+    return result
+
+# 🛒 Xử lý affiliate link (Shopee/Lazada)
+async def process_affiliate_link(update: Update, link: str, platform: str) -> None:
+    """Xử lý affiliate link: mở rộng, rút gọn và tạo QR code."""
+    logging.debug(f"🔧 [{BOT_INSTANCE_ID}] process_affiliate_link được gọi với {platform}: {link}")
+    
+    # Báo "đang gửi ảnh"; chỉ gửi tin "đang xử lý" nếu chưa xong sau PROGRESS_PLACEHOLDER_DELAY_MS
+    async with progress_placeholder(update.message, f"🛒 [{BOT_INSTANCE_ID}] Đang xử lý {platform.title()} link...") as progress:
+        result = await convert_affiliate_link(link, platform)
+        if result.status == "error":
+            await progress.finish(result.error_text)
+            return
+
+        if result.status == "fallback":
+            # Nếu không rút gọn được → Tạo QR cho link gốc và thông báo
+            link = result.link
+            await progress.update(f"⚠️ Không thể rút gọn {platform.title()} link. Tạo QR cho link gốc...")
+            
+            # Tạo QR cho link gốc
+            result_text = f"⚠️ QR của {platform.title()} link gốc:\n{link}"
+            
+            try:
+                await reply_qr(update.message, link, result_text)
+                await progress.finish()
+                return
+            except Exception as e:
+                logging.error(f"❌ Lỗi tạo QR cho link gốc: {e}")
+                errors.inc(platform=platform, stage="qr")
+                await progress.finish(f"❌ Không thể tạo QR cho {platform.title()} link.")
+                return
+
+        short_link = result.short_link
+        unshortened_link = result.unshortened_link
+
+        # Gửi kết quả với QR code
+        # Hiển thị cả link đã unshorten (nếu có) và link affiliate
+        if unshortened_link:
+            result_text = f"🔗 **Link đã unshorten:**\n{unshortened_link}\n\n"
+            result_text += f"✅ **Link affiliate (ăn hoa hồng):**\n{short_link}"
+        else:
+            result_text = f"✅ QR của {platform.title()} link:\n{short_link}"
         
         try:
-            await update.message.reply_photo(
-                photo=InputFile(qr_image, filename="qrcode.png"),
-                caption=result_text,
-                parse_mode='Markdown',
-                reply_to_message_id=update.message.message_id
-            )
-            await processing_message.delete()
-            return
+            await reply_qr(update.message, short_link, result_text)
+            logging.debug(f"📤 [{BOT_INSTANCE_ID}] Gửi kết quả QR cho {platform} link: {short_link}")
+            
+            # Xóa thông báo "đang xử lý" (nếu đã gửi)
+            await progress.finish()
+            
         except Exception as e:
-            print(f"❌ Lỗi tạo QR cho link gốc: {e}")
-            await processing_message.edit_text(f"❌ Không thể tạo QR cho {platform.title()} link.")
-            return
+            logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi gửi QR code: {e}")
+            errors.inc(platform=platform, stage="qr")
+            if unshortened_link:
+                error_text = f"🔗 **Link đã unshorten:**\n{unshortened_link}\n\n"
+                error_text += f"✅ **Link affiliate:**\n{short_link}\n\n❌ Không thể tạo QR code."
+            else:
+                error_text = f"✅ {platform.title()} link đã rút gọn:\n{short_link}\n\n❌ Không thể tạo QR code."
+            await progress.finish(error_text, parse_mode='Markdown')
 
-    # Tạo QR code (chạy trong executor để không block)
-    loop = asyncio.get_event_loop()
-    qr_image = await loop.run_in_executor(None, generate_qr_code, short_link)
-    
-    # Gửi kết quả với QR code
-    # Hiển thị cả link đã unshorten (nếu có) và link affiliate
-    if unshortened_link:
-        result_text = f"🔗 **Link đã unshorten:**\n{unshortened_link}\n\n"
-        result_text += f"✅ **Link affiliate (ăn hoa hồng):**\n{short_link}"
-    else:
-        result_text = f"✅ QR của {platform.title()} link:\n{short_link}"
-    
+# 🛒 Xử lý đồng thời nhiều affiliate link trong một tin nhắn
+async def process_affiliate_links(update: Update, links) -> None:
+    """Convert song song mọi link (giới hạn đồng thời), trả về một danh sách + album QR."""
+    logging.debug(f"🔧 [{BOT_INSTANCE_ID}] Xử lý {len(links)} affiliate link cùng lúc")
+
+    semaphore = asyncio.Semaphore(MESSAGE_LINK_CONCURRENCY)
+
+    async def convert(link, platform):
+        async with semaphore:
+            try:
+                return await convert_affiliate_link(link, platform)
+            except Exception as e:
+                logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi xử lý {link}: {e}")
+                errors.inc(platform=platform, stage="convert")
+                result = LinkResult(link, platform)
+                result.error_text = "❌ Lỗi xử lý link"
+                return result
+
+    async with progress_placeholder(update.message, f"🛒 [{BOT_INSTANCE_ID}] Đang xử lý {len(links)} link...") as progress:
+        results = await asyncio.gather(*(convert(link, platform) for link, platform in links))
+
+        # Danh sách kết quả (text) + album QR (link affiliate, hoặc link gốc nếu không rút gọn được)
+        lines = [f"✅ Kết quả {len(results)} link:"]
+        qr_items = []
+        for index, result in enumerate(results, start=1):
+            if result.status == "ok":
+                lines.append(f"{index}. {result.platform.title()}: {result.short_link}")
+                qr_items.append((result.short_link, f"{index}. {result.short_link}"))
+            elif result.status == "fallback":
+                lines.append(f"{index}. ⚠️ Không rút gọn được, QR link gốc: {result.link}")
+                qr_items.append((result.link, f"{index}. ⚠️ {result.link}"))
+            else:
+                lines.append(f"{index}. {result.error_text.splitlines()[0]} {result.original_link}")
+        summary = "\n".join(lines)
+
+        # Sửa tin "đang xử lý" thành danh sách kết quả (hoặc gửi mới nếu chưa có placeholder)
+        summary_message = await progress.finish(summary, disable_web_page_preview=True)
+    if not qr_items:
+        return
     try:
-        await update.message.reply_photo(
-            photo=InputFile(qr_image, filename="qrcode.png"),
-            caption=result_text,
-            parse_mode='Markdown',
-            reply_to_message_id=update.message.message_id
-        )
-        print(f"📤 [{BOT_INSTANCE_ID}] Gửi kết quả QR cho {platform} link: {short_link}")
-        
-        # Xóa thông báo "đang xử lý"
-        await processing_message.delete()
-        
+        await reply_qr_group(update.message, qr_items)
+        logging.debug(f"📤 [{BOT_INSTANCE_ID}] Gửi album {len(qr_items)} QR")
     except Exception as e:
-        print(f"❌ [{BOT_INSTANCE_ID}] Lỗi gửi QR code: {e}")
-        if unshortened_link:
-            error_text = f"🔗 **Link đã unshorten:**\n{unshortened_link}\n\n"
-            error_text += f"✅ **Link affiliate:**\n{short_link}\n\n❌ Không thể tạo QR code."
-        else:
-            error_text = f"✅ {platform.title()} link đã rút gọn:\n{short_link}\n\n❌ Không thể tạo QR code."
-        await processing_message.edit_text(error_text, parse_mode='Markdown')
+        logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi gửi album QR: {e}")
+        errors.inc(platform="multi", stage="qr")
+        await summary_message.edit_text(summary + "\n\n❌ Không thể tạo QR code.", disable_web_page_preview=True)
 
 # 🎯 Tạo QR cho nội dung bất kỳ
 async def create_qr_for_content(update: Update, content: str) -> None:
     """Tạo QR code cho bất kỳ nội dung gì."""
-    print(f"🎯 [{BOT_INSTANCE_ID}] Tạo QR cho nội dung: {content}")
-    
-    # Gửi thông báo đang tạo QR
-    processing_message = await update.message.reply_text(f"🎯 [{BOT_INSTANCE_ID}] Đang tạo QR code...")
+    logging.debug(f"🎯 [{BOT_INSTANCE_ID}] Tạo QR cho nội dung: {content}")
     
-    try:
-        # Tạo QR code (chạy trong executor để không block)
-        loop = asyncio.get_event_loop()
-        qr_image = await loop.run_in_executor(None, generate_qr_code, content)
-        
-        # Gửi kết quả với QR code
-        # Kiểm tra xem có phải là link không
-        if content.startswith(('http://', 'https://')):
-            result_text = f"✅ QR của link:\n{content}"
-        else:
-            result_text = f"✅ QR của nội dung:\n`{content}`"
-        
-        await update.message.reply_photo(
-            photo=InputFile(qr_image, filename="qrcode.png"),
-            caption=result_text,
-            parse_mode='Markdown',
-            reply_to_message_id=update.message.message_id
-        )
-        print(f"📤 [{BOT_INSTANCE_ID}] Gửi QR code cho nội dung")
-        
-        # Xóa thông báo "đang xử lý"
-        await processing_message.delete()
-        
-    except Exception as e:
-        print(f"❌ [{BOT_INSTANCE_ID}] Lỗi tạo QR code: {e}")
-        # Kiểm tra xem có phải là link không để format phù hợp
-        if content.startswith(('http://', 'https://')):
-            await processing_message.edit_text(f"❌ Không thể tạo QR code cho link:\n{content}", parse_mode='Markdown')
-        else:
-            await processing_message.edit_text(f"❌ Không thể tạo QR code cho nội dung:\n`{content}`", parse_mode='Markdown')
+    # QR thường xong rất nhanh → thường chỉ tốn một lần sendPhoto, không có tin "đang tạo"
+    async with progress_placeholder(update.message, f"🎯 [{BOT_INSTANCE_ID}] Đang tạo QR code...") as progress:
+        try:
+            # Gửi kết quả với QR code (render trong executor nếu chưa có trong cache)
+            # Kiểm tra xem có phải là link không
+            if content.startswith(('http://', 'https://')):
+                result_text = f"✅ QR của link:\n{content}"
+            else:
+                result_text = f"✅ QR của nội dung:\n`{content}`"
+            
+            await reply_qr(update.message, content, result_text)
+            logging.debug(f"📤 [{BOT_INSTANCE_ID}] Gửi QR code cho nội dung")
+            
+            # Xóa thông báo "đang xử lý" (nếu đã gửi)
+            await progress.finish()
+            
+        except Exception as e:
+            logging.error(f"❌ [{BOT_INSTANCE_ID}] Lỗi tạo QR code: {e}")
+            errors.inc(platform="text", stage="qr")
+            # Kiểm tra xem có phải là link không để format phù hợp
+            if content.startswith(('http://', 'https://')):
+                await progress.finish(f"❌ Không thể tạo QR code cho link:\n{content}", parse_mode='Markdown')
+            else:
+                await progress.finish(f"❌ Không thể tạo QR code cho nội dung:\n`{content}`", parse_mode='Markdown')
 
 # 🔁 Wrapper cho process_link (để tương thích ngược)
 async def process_link(update: Update, link: str) -> None:
     """Wrapper để tương thích với lệnh /rutgon."""
-    # Kiểm tra xem có phải Shopee/Lazada không
-    if "shopee.vn" in link or "shp.ee" in link or "vn.shp.ee" in link or "s.shopee.vn" in link:
-        await process_affiliate_link(update, link, "shopee")
-    elif any(domain in link for domain in ["lazada.vn", "www.lazada.vn", "lzd.co", "m.lazada.vn", "s.lazada.vn"]):
-        await process_affiliate_link(update, link, "lazada")
+    # Kiểm tra xem có phải Shopee/Lazada không (kể cả link gõ tay thiếu scheme hoặc scheme viết hoa)
+    records = affiliate_links(normalize_link(link))
+    if records:
+        await process_affiliate_link(update, records[0].url, records[0].platform)
     else:
         # Link khác → tạo QR trực tiếp
         await create_qr_for_content(update, link)
 
-# 🟢 Hàm main để khởi chạy bot
-def main() -> None:
-    """Khởi chạy bot Telegram."""
-    print(f'🚀 [{BOT_INSTANCE_ID}] Đang khởi động bot Telegram...')
-    
-    # Tạo Application
-    application = Application.builder().token(TOKEN).build()
+# 📊 Gauge đọc trạng thái các thành phần tại thời điểm scrape
+registry.gauge("bot_scheduler_queue_depth", "Số việc đang chờ trong scheduler", lambda: scheduler.queue_depth)
+registry.gauge("bot_scheduler_active", "Số việc đang chạy", lambda: scheduler.stats()["active"])
+registry.gauge("bot_bulk_jobs_active", "Số việc hàng loạt đang chạy", lambda: bulk_scheduler.stats()["active"])
+registry.gauge("bot_bulk_queue_depth", "Số việc hàng loạt đang chờ", lambda: bulk_scheduler.queue_depth)
+registry.gauge("bot_accesstrade_tokens", "Token còn lại trong bucket AccessTrade", lambda: round(accesstrade_bucket.tokens, 2))
+registry.gauge("bot_circuit_open", "Circuit breaker đang mở (1) hoặc không (0)",
+               lambda: {(("service", p.breaker.name),): int(p.breaker.is_open) for p in (accesstrade_policy, expand_policy)})
+registry.gauge("bot_shorten_batch_avg_size", "Kích thước batch product_link/create trung bình",
+               lambda: shorten_batcher.stats()["avg_batch_size"])
+
+# 📊 Endpoint /metrics (tắt nếu METRICS_PORT = 0)
+metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+
+# 🔁 Hook vòng đời Application
+# ♻️ Trạng thái nóng được snapshot khi dừng và nạp lại khi khởi động (STATE_SNAPSHOT_PATH rỗng = tắt)
+state_snapshot = StateSnapshot(STATE_SNAPSHOT_PATH, max_age=STATE_SNAPSHOT_MAX_AGE) if STATE_SNAPSHOT_PATH else None
+SNAPSHOT_COMPONENTS = {
+    "campaigns": campaign_registry,
+    "expand_cache": expand_cache,
+    "link_cache": link_cache,
+    "qr_cache": qr_cache,
+    "dedup": processed_messages,
+}
+
+async def post_init(application: Application) -> None:
+    """Khởi tạo tài nguyên dùng chung trước khi nhận update."""
+    startup_timer.mark("initialize")
+    await start_http_client(application)
+    if metrics_server:
+        await metrics_server.start()
+    # Process con render QR khởi động trong nền
+    qr_engine.warmup()
+    if state_snapshot:
+        state_snapshot.load(SNAPSHOT_COMPONENTS)
+        startup_timer.mark("snapshot")
+    # Prewarm campaign ID trước khi nhận update đầu tiên (bỏ qua nếu snapshot còn mới)
+    await campaign_registry.start()
+    startup_timer.mark("prewarm")
+    startup_timer.report()
+
+async def post_shutdown(application: Application) -> None:
+    """Giải phóng tài nguyên khi bot dừng."""
+    await campaign_registry.stop()
+    if state_snapshot:
+        state_snapshot.save(SNAPSHOT_COMPONENTS)
+    await close_http_client(application)
+    if metrics_server:
+        await metrics_server.stop()
+    link_cache.close()
+    qr_cache.close()
+    await qr_engine.stop()
+    processed_messages.close()
+
+# 🏗️ Tạo Application và đăng ký handler
+def build_application() -> Application:
+    """Tạo Application đã đăng ký đủ handler (dùng cho main và benchmark)."""
+    # Tạo Application (các tài nguyên dùng chung được mở/đóng theo vòng đời Application)
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(TELEGRAM_API_BASE_URL)
+        .base_file_url(TELEGRAM_FILE_BASE_URL)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Đăng ký các handler
     application.add_handler(CommandHandler("start", start))
@@ -475,11 +1005,67 @@ def main() -> None:
     
     # Handler cho tin nhắn thường (không phải lệnh)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # File danh sách link (.txt/.csv) → chuyển đổi hàng loạt
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension("txt") | filters.Document.FileExtension("csv"), handle_document
+    ))
+    startup_timer.mark("build")
+    return application
+
+# 👷 Biến môi trường riêng cho từng worker process (BOT_RUN_MODE=workers)
+def worker_env(index):
+    """Instance ID, cổng metrics, file snapshot riêng; hạn mức AccessTrade chia đều cho các worker.
+
+    Mỗi chat chỉ chạy một tin nhắn tại một thời điểm → worker trả lời đúng thứ tự tin nhắn trong chat.
+    """
+    snapshot_root, snapshot_ext = os.path.splitext(STATE_SNAPSHOT_PATH)
+    return {
+        "BOT_INSTANCE_ID": f"{BOT_INSTANCE_ID}-w{index}",
+        "SCHED_CHAT_CONCURRENCY": "1",
+        "METRICS_PORT": str(METRICS_PORT + 1 + index if METRICS_PORT else 0),
+        "ACCESSTRADE_RATE_PER_SEC": str(ACCESSTRADE_RATE_PER_SEC / WORKER_PROCESSES),
+        "ACCESSTRADE_BURST": str(max(1, ACCESSTRADE_BURST // WORKER_PROCESSES)),
+        "STATE_SNAPSHOT_PATH": f"{snapshot_root}-w{index}{snapshot_ext}" if STATE_SNAPSHOT_PATH else "",
+    }
+
+# 🟢 Hàm main để khởi chạy bot
+def main() -> None:
+    """Khởi chạy bot Telegram."""
+    logging.info(f'🚀 [{BOT_INSTANCE_ID}] Đang khởi động bot Telegram...')
+
+    if BOT_RUN_MODE == "workers":
+        from worker_pool import WorkerPool, run_ingress
 
-    print(f'✅ [{BOT_INSTANCE_ID}] Bot Telegram đã sẵn sàng!')
+        # Process này chỉ long-poll và chia update theo chat cho các worker (mỗi worker một Application)
+        logging.info(f'👷 [{BOT_INSTANCE_ID}] Chạy chế độ workers: {WORKER_PROCESSES} process')
+        pool = WorkerPool(WORKER_PROCESSES, build_application, worker_env=worker_env)
+        asyncio.run(run_ingress(f"{TELEGRAM_API_BASE_URL}{TOKEN}", pool, ALLOWED_UPDATES))
+        return
+
+    application = build_application()
+
+    logging.info(f'✅ [{BOT_INSTANCE_ID}] Bot Telegram đã sẵn sàng!')
     
     # Chạy bot
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BOT_RUN_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required when BOT_RUN_MODE=webhook!")
+        logging.info(f'🌐 [{BOT_INSTANCE_ID}] Chạy chế độ webhook: {WEBHOOK_URL}')
+        from webhook_server import run_webhook
+        asyncio.run(run_webhook(
+            application,
+            webhook_url=WEBHOOK_URL,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET_TOKEN or secrets.token_urlsafe(32),
+            allowed_updates=ALLOWED_UPDATES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        ))
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+startup_timer.mark("import")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,162 @@
+import asyncio
+import csv
+import logging
+import time
+import zipfile
+from contextlib import nullcontext
+
+from link_classifier import extract_links
+
+CSV_HEADER = ["line", "original_link", "platform", "status", "affiliate_link", "expanded_link", "note"]
+
+
+def iter_text_links(text):
+    """(số dòng, LinkRecord) cho mọi URL trong một đoạn text (vd. /rutgon nhiều link)."""
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        for record in extract_links(line):
+            yield line_no, record
+
+
+def iter_document_links(path):
+    """Đọc file .txt/.csv từng dòng (không nạp cả file vào RAM), trả (số dòng, LinkRecord)."""
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        if path.lower().endswith(".csv"):
+            for line_no, row in enumerate(csv.reader(f), start=1):
+                for cell in row:
+                    for record in extract_links(cell):
+                        yield line_no, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                for record in extract_links(line):
+                    yield line_no, record
+
+
+class BulkStats:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.ok = 0
+        self.fallback = 0
+        self.error = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def record(self, status):
+        self.done += 1
+        setattr(self, status, getattr(self, status) + 1)
+
+
+class BulkJob:
+    """Chuyển đổi hàng loạt link, ghi CSV (và zip QR) theo đúng thứ tự đầu vào.
+
+    - `concurrency` worker lấy link từ hàng đợi có giới hạn → bộ nhớ không phụ thuộc kích thước file
+    - Kết quả xong trước được giữ tạm (tối đa `window` dòng) cho tới khi ghi được theo thứ tự
+    - `convert(record)` trả về LinkResult; `render_qr(content)` trả byte PNG (None = không tạo zip)
+    - `progress(stats)` được gọi mỗi `progress_interval` giây và khi xong
+    """
+
+    def __init__(self, convert, render_qr=None, concurrency=20, window=None, progress=None, progress_interval=5):
+        self.convert = convert
+        self.render_qr = render_qr
+        self.concurrency = max(1, concurrency)
+        self.window = window or self.concurrency * 10
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+    async def _convert_one(self, line_no, record):
+        """Trả (status, dòng CSV, nội dung cần tạo QR)."""
+        if record.platform is None:
+            return "skipped", [line_no, record.url, "", "skipped", "", "", "không phải link Shopee/Lazada"], None
+        try:
+            result = await self.convert(record)
+        except Exception as e:
+            logging.error(f"❌ Lỗi chuyển đổi hàng loạt {record.url}: {type(e).__name__}: {e}")
+            return "error", [line_no, record.url, record.platform, "error", "", "", type(e).__name__], None
+
+        if result.status == "ok":
+            note, qr_content = "", result.short_link
+        elif result.status == "fallback":
+            note, qr_content = result.fallback_reason, result.link
+        else:
+            note = result.error_text.splitlines()[0] if result.error_text else ""
+            qr_content = None
+        row = [line_no, record.url, record.platform, result.status,
+               result.short_link or "", result.unshortened_link or "", note]
+        return result.status, row, qr_content
+
+    async def run(self, records, csv_path, zip_path=None, total=0):
+        """Chạy hết `records` (iterator (số dòng, LinkRecord)), trả về BulkStats."""
+        stats = BulkStats(total)
+        window = asyncio.Semaphore(self.window)
+        queue = asyncio.Queue(maxsize=self.concurrency)
+        finished = {}  # index -> (dòng CSV, byte PNG) chờ ghi theo thứ tự
+        next_index = 0
+
+        with open(csv_path, "w", newline="", encoding="utf-8-sig") as csv_file, \
+                (zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) if zip_path else nullcontext()) as archive:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADER)
+
+            def flush():
+                nonlocal next_index
+                while next_index in finished:
+                    row, png = finished.pop(next_index)
+                    writer.writerow(row)
+                    if archive is not None and png:
+                        # PNG đã nén sẵn → ZIP_STORED, không nén lại
+                        archive.writestr(f"{next_index + 1:05d}_line{row[0]}.png", png)
+                    next_index += 1
+                    window.release()
+
+            async def produce():
+                for index, (line_no, record) in enumerate(records):
+                    await window.acquire()
+                    await queue.put((index, line_no, record))
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+            async def work():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    index, line_no, record = item
+                    status, row, qr_content = await self._convert_one(line_no, record)
+                    png = None
+                    if self.render_qr and qr_content:
+                        try:
+                            png = await self.render_qr(qr_content)
+                        except Exception as e:
+                            logging.error(f"❌ Lỗi tạo QR hàng loạt: {type(e).__name__}: {e}")
+                    stats.record(status)
+                    finished[index] = (row, png)
+                    flush()
+
+            async def report():
+                while True:
+                    await asyncio.sleep(self.progress_interval)
+                    await self._report(stats)
+
+            tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(self.concurrency)]
+            reporter = asyncio.create_task(report()) if self.progress else None
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks + ([reporter] if reporter else []):
+                    task.cancel()
+                await asyncio.gather(*tasks, *([reporter] if reporter else []), return_exceptions=True)
+
+        await self._report(stats)
+        return stats
+
+    async def _report(self, stats):
+        if self.progress is None:
+            return
+        try:
+            await self.progress(stats)
+        except Exception as e:
+            logging.debug(f"Không cập nhật được tiến độ: {type(e).__name__}: {e}")
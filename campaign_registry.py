@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+
+from singleflight import SingleFlight
+
+# 🏷️ Tên merchant của từng platform trên AccessTrade
+MERCHANT_ALIASES = {
+    "shopee": ("shopee",),
+    "lazada": ("lazadacps", "lazada"),  # Try both names
+}
+
+
+class CampaignRegistry:
+    """Campaign ID của mọi platform, lấy bằng một lần gọi /v1/campaigns.
+
+    - Gộp các lần tải đồng thời (single-flight)
+    - Làm mới nền theo `refresh_interval`
+    - Platform không có campaign (hoặc tải lỗi) được cache âm trong `negative_ttl`
+    """
+
+    def __init__(self, fetch_campaigns, refresh_interval=3600, negative_ttl=300):
+        self.fetch_campaigns = fetch_campaigns  # coroutine → danh sách campaign (dict)
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self._campaign_ids = {}  # platform -> campaign_id (None = không có)
+        self._loaded_at = None
+        self._failed_at = None
+        self._flight = SingleFlight()
+        self._refresh_task = None
+        self.fetches = 0
+        self.failures = 0
+
+    def _age(self):
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def _needs_refresh(self, platform):
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.negative_ttl:
+            # Vừa tải lỗi → không gọi lại API cho tới khi hết negative_ttl
+            return False
+        age = self._age()
+        if age is None or age > self.refresh_interval:
+            return True
+        return self._campaign_ids.get(platform) is None and age > self.negative_ttl
+
+    async def get(self, platform):
+        """Campaign ID của platform (None nếu không có campaign được duyệt)."""
+        if platform not in MERCHANT_ALIASES:
+            return None
+        if self._needs_refresh(platform):
+            await self.refresh()
+        return self._campaign_ids.get(platform)
+
+    async def refresh(self):
+        """Tải lại danh sách campaign (các lời gọi đồng thời dùng chung một request)."""
+        return await self._flight.do("campaigns", self._load)
+
+    async def _load(self):
+        self.fetches += 1
+        try:
+            campaigns = await self.fetch_campaigns()
+        except Exception as e:
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            logging.error(f"❌ Lỗi tải danh sách campaign: {type(e).__name__}: {e}")
+            return False
+
+        campaign_ids = {}
+        for platform, merchants in MERCHANT_ALIASES.items():
+            campaign_ids[platform] = next(
+                (c["id"] for merchant in merchants for c in campaigns if c.get("merchant") == merchant),
+                None,
+            )
+        self._campaign_ids = campaign_ids
+        self._loaded_at = time.monotonic()
+        self._failed_at = None
+        logging.info(f"📋 Đã tải {len(campaigns)} campaign: {campaign_ids}")
+        return True
+
+    def snapshot(self):
+        return {"campaign_ids": dict(self._campaign_ids), "age_seconds": self._age()}
+
+    def restore(self, data, age=0):
+        """Nạp campaign ID từ snapshot lưu `age` giây trước (giữ nguyên tuổi của dữ liệu)."""
+        if data.get("age_seconds") is None:
+            return
+        self._campaign_ids = dict(data["campaign_ids"])
+        self._loaded_at = time.monotonic() - data["age_seconds"] - age
+
+    async def _refresh_loop(self):
+        while True:
+            age = self._age()
+            if self._failed_at is not None:
+                # Lần tải gần nhất lỗi (kể cả prewarm khi chưa có dữ liệu) → thử lại khi hết negative_ttl
+                delay = max(0, self.negative_ttl - (time.monotonic() - self._failed_at))
+            elif age is None:
+                delay = self.refresh_interval
+            else:
+                # Dữ liệu nạp từ snapshot đã có tuổi → làm mới sớm hơn
+                delay = max(self.negative_ttl, self.refresh_interval - age)
+            await asyncio.sleep(delay)
+            await self.refresh()
+
+    async def start(self):
+        """Prewarm trước khi nhận update (trừ khi đã nạp từ snapshot còn mới), sau đó làm mới định kỳ trong nền."""
+        age = self._age()
+        if age is None or age > self.refresh_interval:
+            await self.refresh()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self):
+        age = self._age()
+        return {
+            "campaigns": dict(self._campaign_ids),
+            "age_seconds": None if age is None else int(age),
+            "fetches": self.fetches,
+            "failures": self.failures,
+        }
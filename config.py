@@ -9,10 +9,127 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
 # AccessTrade API Configuration
 ACCESSTRADE_TOKEN = os.getenv('ACCESSTRADE_TOKEN')
+ACCESSTRADE_API_BASE = os.getenv('ACCESSTRADE_API_BASE', 'https://api.accesstrade.vn').rstrip('/')
 
 # Bot Instance ID
 BOT_INSTANCE_ID = os.getenv('BOT_INSTANCE_ID', 'default')
 
+# Shared HTTP client (connection pool for all outbound requests)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+
+# SSL verification - enable for production, disable for development
+SSL_VERIFY = os.getenv('SSL_VERIFY', 'true').lower() == 'true'
+
+# AccessTrade product_link/create micro-batching
+SHORTEN_BATCH_WINDOW_MS = float(os.getenv('SHORTEN_BATCH_WINDOW_MS', '30'))
+SHORTEN_BATCH_MAX_SIZE = int(os.getenv('SHORTEN_BATCH_MAX_SIZE', '20'))
+
+# Persistent affiliate-link cache (in-memory LRU + SQLite file)
+LINK_CACHE_PATH = os.getenv('LINK_CACHE_PATH', 'link_cache.sqlite3')
+LINK_CACHE_TTL = int(os.getenv('LINK_CACHE_TTL', str(7 * 24 * 3600)))
+LINK_CACHE_MEMORY_SIZE = int(os.getenv('LINK_CACHE_MEMORY_SIZE', '5000'))
+LINK_CACHE_MAX_ROWS = int(os.getenv('LINK_CACHE_MAX_ROWS', '200000'))
+
+# expand_url redirect-chain cache (negative results use the shorter TTL)
+EXPAND_CACHE_SIZE = int(os.getenv('EXPAND_CACHE_SIZE', '10000'))
+EXPAND_CACHE_TTL = int(os.getenv('EXPAND_CACHE_TTL', '3600'))
+EXPAND_NEGATIVE_TTL = int(os.getenv('EXPAND_NEGATIVE_TTL', '60'))
+
+# Rendered-QR cache (Telegram file_id map persisted in SQLite + PNG bytes LRU)
+QR_CACHE_PATH = os.getenv('QR_CACHE_PATH', 'qr_cache.sqlite3')
+QR_CACHE_MAX_FILE_IDS = int(os.getenv('QR_CACHE_MAX_FILE_IDS', '50000'))
+QR_CACHE_MAX_PNG_BYTES = int(os.getenv('QR_CACHE_MAX_PNG_BYTES', str(16 * 1024 * 1024)))
+
+# QR rendering process pool (0 = render in the default thread pool)
+QR_PROCESS_WORKERS = int(os.getenv('QR_PROCESS_WORKERS', '2'))
+
+# Duplicate-update filter (set DEDUP_SHARED_PATH to share it between processes on one host)
+DEDUP_WINDOW_SECONDS = int(os.getenv('DEDUP_WINDOW_SECONDS', '600'))
+DEDUP_MAX_ITEMS = int(os.getenv('DEDUP_MAX_ITEMS', '10000'))
+DEDUP_SHARED_PATH = os.getenv('DEDUP_SHARED_PATH', '')
+
+# Run mode: "polling" (default), "webhook" (embedded aiohttp server)
+# or "workers" (one polling process sharding updates by chat to WORKER_PROCESSES bot processes)
+BOT_RUN_MODE = os.getenv('BOT_RUN_MODE', 'polling').lower()
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', str(os.cpu_count() or 2)))
+# Number of updates processed concurrently
+# (kept high: the fair scheduler below is the real limit on concurrent work)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '256'))
+# Bot API endpoint (override to test against a local fake Bot API)
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+TELEGRAM_FILE_BASE_URL = os.getenv('TELEGRAM_FILE_BASE_URL', 'https://api.telegram.org/file/bot')
+
+# Webhook mode
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Leave empty to generate a random secret on every start
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Max affiliate links converted concurrently for one message
+MESSAGE_LINK_CONCURRENCY = int(os.getenv('MESSAGE_LINK_CONCURRENCY', '5'))
+
+# AccessTrade campaign registry (background refresh + negative-result TTL, in seconds)
+CAMPAIGN_REFRESH_INTERVAL = int(os.getenv('CAMPAIGN_REFRESH_INTERVAL', '3600'))
+CAMPAIGN_NEGATIVE_TTL = int(os.getenv('CAMPAIGN_NEGATIVE_TTL', '300'))
+
+# AccessTrade rate limit (token bucket, one token per product_link/create request; when empty, the bot falls back to a QR of the original link)
+ACCESSTRADE_RATE_PER_SEC = float(os.getenv('ACCESSTRADE_RATE_PER_SEC', '5'))
+ACCESSTRADE_BURST = int(os.getenv('ACCESSTRADE_BURST', '20'))
+
+# Per-chat fairness scheduler
+SCHED_GLOBAL_CONCURRENCY = int(os.getenv('SCHED_GLOBAL_CONCURRENCY', '16'))
+SCHED_CHAT_CONCURRENCY = int(os.getenv('SCHED_CHAT_CONCURRENCY', '2'))
+SCHED_USER_CONCURRENCY = int(os.getenv('SCHED_USER_CONCURRENCY', '2'))
+SCHED_CHAT_QUEUE_LIMIT = int(os.getenv('SCHED_CHAT_QUEUE_LIMIT', '50'))
+
+# Send the "processing..." placeholder only if the reply is not ready after this delay
+# (a chat action is always shown immediately; 0 = always post the placeholder right away)
+PROGRESS_PLACEHOLDER_DELAY_MS = int(os.getenv('PROGRESS_PLACEHOLDER_DELAY_MS', '1500'))
+
+# Bulk conversion (.txt/.csv upload or /rutgon with many links)
+BULK_MAX_FILE_BYTES = int(os.getenv('BULK_MAX_FILE_BYTES', str(5 * 1024 * 1024)))
+BULK_MAX_LINKS = int(os.getenv('BULK_MAX_LINKS', '5000'))
+BULK_CONCURRENCY = int(os.getenv('BULK_CONCURRENCY', '20'))
+BULK_PROGRESS_INTERVAL = float(os.getenv('BULK_PROGRESS_INTERVAL', '5'))
+# Bulk jobs run in their own lane (not in the SCHED_* slots): jobs running at once, queued jobs per chat
+BULK_MAX_JOBS = int(os.getenv('BULK_MAX_JOBS', '2'))
+BULK_QUEUE_LIMIT = int(os.getenv('BULK_QUEUE_LIMIT', '1'))
+# Fraction of ACCESSTRADE_BURST that bulk jobs never spend (kept for interactive messages)
+BULK_QUOTA_RESERVE = float(os.getenv('BULK_QUOTA_RESERVE', '0.5'))
+
+# Circuit breaker around AccessTrade and link expansion
+# (trips when >= BREAKER_FAILURE_RATE of the last BREAKER_WINDOW calls failed or were slower than *_SLOW_CALL_SECONDS)
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', '0.5'))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+ACCESSTRADE_SLOW_CALL_SECONDS = float(os.getenv('ACCESSTRADE_SLOW_CALL_SECONDS', '3'))
+EXPAND_SLOW_CALL_SECONDS = float(os.getenv('EXPAND_SLOW_CALL_SECONDS', '2'))
+
+# Jittered retries (total attempts, timeouts are never retried; product_link/create retries cost one AccessTrade token each) and hedged requests for idempotent GETs
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', '2'))
+RETRY_BASE_DELAY_MS = int(os.getenv('RETRY_BASE_DELAY_MS', '100'))
+RETRY_MAX_DELAY_MS = int(os.getenv('RETRY_MAX_DELAY_MS', '1000'))
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+HEDGE_MIN_DELAY_MS = int(os.getenv('HEDGE_MIN_DELAY_MS', '200'))
+HEDGE_MAX_DELAY_MS = int(os.getenv('HEDGE_MAX_DELAY_MS', '3000'))
+
+# Warm-restart state snapshot (campaign IDs, expand cache, hot link/QR cache keys, dedup window)
+# written on shutdown and loaded on boot; empty path disables it, older snapshots are ignored
+STATE_SNAPSHOT_PATH = os.getenv('STATE_SNAPSHOT_PATH', 'state_snapshot.json')
+STATE_SNAPSHOT_MAX_AGE = int(os.getenv('STATE_SNAPSHOT_MAX_AGE', '3600'))
+
+# Logging level and local Prometheus-style metrics endpoint (METRICS_PORT=0 disables it)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
 # Validate required tokens
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN is required! Please set it in .env file or environment variables.")
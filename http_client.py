@@ -0,0 +1,101 @@
+import logging
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    SSL_VERIFY,
+)
+
+# ⏱️ Các profile timeout cho từng loại request
+TIMEOUT_PROFILES = {
+    # Expand link rút gọn: timeout ngắn để không làm chậm bot
+    "expand": aiohttp.ClientTimeout(total=8, connect=4),
+    # Gọi API AccessTrade
+    "api": aiohttp.ClientTimeout(total=10, connect=5),
+}
+
+# 🔒 SSL theo profile (expand giữ nguyên hành vi cũ: không verify)
+SSL_PROFILES = {
+    "expand": False,
+    "api": SSL_VERIFY,
+}
+
+
+class HttpClient:
+    """ClientSession dùng chung cho toàn bộ request ra ngoài (pool + keep-alive + DNS cache)."""
+
+    def __init__(self, limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl=HTTP_DNS_CACHE_TTL, keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                 resolver=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.resolver = resolver
+        self._session = None
+
+    @property
+    def started(self):
+        return self._session is not None and not self._session.closed
+
+    async def start(self):
+        """Tạo session (gọi trong event loop, thường từ post_init của Application)."""
+        if self.started:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+            resolver=self.resolver,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=TIMEOUT_PROFILES["api"])
+        logging.info(f"🌐 HTTP client sẵn sàng (limit={self.limit}, per_host={self.limit_per_host})")
+
+    async def close(self):
+        """Đóng session và toàn bộ kết nối trong pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logging.info("🌐 HTTP client đã đóng")
+        self._session = None
+
+    @property
+    def session(self):
+        if not self.started:
+            raise RuntimeError("HTTP client chưa được khởi động")
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method, url, profile="api", **kwargs):
+        """Gửi request qua session dùng chung với timeout/SSL theo profile."""
+        if not self.started:
+            await self.start()
+        kwargs.setdefault("timeout", TIMEOUT_PROFILES[profile])
+        kwargs.setdefault("ssl", SSL_PROFILES[profile])
+        async with self._session.request(method, url, **kwargs) as response:
+            yield response
+
+    def get(self, url, profile="api", **kwargs):
+        return self.request("GET", url, profile=profile, **kwargs)
+
+    def post(self, url, profile="api", **kwargs):
+        return self.request("POST", url, profile=profile, **kwargs)
+
+
+# 🌐 Instance dùng chung cho cả ứng dụng
+http_client = HttpClient()
+
+
+# 🔁 Hook vòng đời cho Application (post_init / post_shutdown)
+async def start_http_client(application) -> None:
+    await http_client.start()
+
+
+async def close_http_client(application) -> None:
+    await http_client.close()
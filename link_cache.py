@@ -0,0 +1,151 @@
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+from link_classifier import canonicalize_url
+from config import LINK_CACHE_PATH, LINK_CACHE_TTL, LINK_CACHE_MEMORY_SIZE, LINK_CACHE_MAX_ROWS
+
+# Số khoá mỗi câu SELECT khi nạp snapshot (dưới giới hạn 999 tham số của SQLite cũ)
+RESTORE_CHUNK = 500
+
+
+class LinkCache:
+    """Cache 2 tầng (LRU trong RAM + SQLite) cho (platform, URL chuẩn hoá) → short link."""
+
+    def __init__(self, path=LINK_CACHE_PATH, ttl=LINK_CACHE_TTL,
+                 memory_size=LINK_CACHE_MEMORY_SIZE, max_rows=LINK_CACHE_MAX_ROWS):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self._memory = OrderedDict()  # (platform, key) -> (short_link, expanded_url, created_at)
+        self._db = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS links ("
+                " platform TEXT NOT NULL, key TEXT NOT NULL, short_link TEXT NOT NULL,"
+                " expanded_url TEXT, created_at REAL NOT NULL, PRIMARY KEY (platform, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS links_created_at ON links (created_at)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, cache_key, entry):
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, platform, url):
+        """Trả về (short_link, expanded_url) nếu còn hạn, ngược lại None."""
+        cache_key = (platform, canonicalize_url(url))
+        now = time.time()
+
+        entry = self._memory.get(cache_key)
+        if entry is None:
+            try:
+                row = self._connect().execute(
+                    "SELECT short_link, expanded_url, created_at FROM links WHERE platform = ? AND key = ?",
+                    cache_key,
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.error(f"❌ Lỗi đọc link cache: {e}")
+                row = None
+            if row is not None:
+                entry = tuple(row)
+                self._remember(cache_key, entry)
+        else:
+            self._memory.move_to_end(cache_key)
+
+        if entry is None or now - entry[2] > self.ttl:
+            if entry is not None:
+                self._memory.pop(cache_key, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def set(self, platform, url, short_link, expanded_url=None):
+        """Lưu kết quả rút gọn cho URL (ghi cả RAM và SQLite)."""
+        cache_key = (platform, canonicalize_url(url))
+        entry = (short_link, expanded_url, time.time())
+        self._remember(cache_key, entry)
+        try:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO links (platform, key, short_link, expanded_url, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*cache_key, *entry),
+            )
+            db.commit()
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Lỗi ghi link cache: {e}")
+
+    def evict(self):
+        """Xoá bản ghi hết hạn và cắt bớt bản ghi cũ nhất khi vượt max_rows."""
+        db = self._connect()
+        db.execute("DELETE FROM links WHERE created_at < ?", (time.time() - self.ttl,))
+        (count,) = db.execute("SELECT COUNT(*) FROM links").fetchone()
+        if count > self.max_rows:
+            db.execute(
+                "DELETE FROM links WHERE rowid IN (SELECT rowid FROM links ORDER BY created_at LIMIT ?)",
+                (count - self.max_rows,),
+            )
+        db.commit()
+
+    def snapshot(self):
+        """Khoá đang nằm trong RAM (thứ tự LRU); dữ liệu đã có trong SQLite."""
+        return [list(cache_key) for cache_key in self._memory]
+
+    def restore(self, keys, age=0):
+        """Nạp lại vào RAM các khoá đang nóng trước khi restart (đọc SQLite theo lô `key IN (...)`)."""
+        db = self._connect()
+        now = time.time()
+        cache_keys = [(platform, key) for platform, key in keys[-self.memory_size:]]
+        by_platform = {}
+        for platform, key in cache_keys:
+            by_platform.setdefault(platform, []).append(key)
+        found = {}
+        for platform, platform_keys in by_platform.items():
+            for start in range(0, len(platform_keys), RESTORE_CHUNK):
+                chunk = platform_keys[start:start + RESTORE_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = db.execute(
+                    "SELECT key, short_link, expanded_url, created_at FROM links"
+                    f" WHERE platform = ? AND key IN ({placeholders})",
+                    (platform, *chunk),
+                )
+                for key, *entry in rows:
+                    found[(platform, key)] = tuple(entry)
+        # Giữ đúng thứ tự LRU của snapshot
+        for cache_key in cache_keys:
+            entry = found.get(cache_key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                self._remember(cache_key, entry)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0,
+        }
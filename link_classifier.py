@@ -0,0 +1,158 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 🔎 Mọi URL trong tin nhắn, bắt luôn host (một lần quét; URL lồng trong query của URL khác không bị tách riêng)
+# (phân biệt hoa/thường như pattern cũ: regex không IGNORECASE nhanh hơn đáng kể)
+URL_RE = re.compile(r"https?://([^\s/?#<>\"'`:@]+)(?::\d+)?([^\s<>\"'`]*)")
+
+# Scheme viết hoa ("HTTPS://") cũng là URL khi người dùng gõ tay link cho /rutgon
+SCHEME_RE = re.compile(r"(https?)://", re.IGNORECASE)
+HOST_END_RE = re.compile(r"[/?#:]")
+
+# Dấu câu dính cuối URL khi người dùng viết "link: https://...)." → không thuộc URL
+TRAILING_PUNCTUATION = ".,;:!?)]}>»”’\"'"
+
+# 🏷️ Host được hỗ trợ → (platform, là link rút gọn, cần expand trước khi gọi AccessTrade)
+# vn.shp.ee / shp.ee được AccessTrade nhận trực tiếp nên không cần expand
+HOSTS = {
+    "shopee.vn": ("shopee", False, False),
+    "www.shopee.vn": ("shopee", False, False),
+    "s.shopee.vn": ("shopee", True, True),
+    "vn.shp.ee": ("shopee", True, False),
+    "shp.ee": ("shopee", True, False),
+    "lazada.vn": ("lazada", False, False),
+    "www.lazada.vn": ("lazada", False, False),
+    "m.lazada.vn": ("lazada", False, False),
+    "s.lazada.vn": ("lazada", True, True),
+    "lzd.co": ("lazada", True, True),
+}
+
+# 🧹 Query param tracking cần loại bỏ khi chuẩn hoá URL
+TRACKING_PARAMS = {
+    "sp_atk", "xptdk", "smtt", "spm", "scm", "mmp_pid", "gads_t_sig", "uls_trackid",
+    "af_siteid", "is_from_login", "clickTrackInfo", "trafficFrom",
+    "laz_trackid", "mkttid", "fbclid", "gclid", "dsource", "exlaz", "sub_id", "utm_source",
+    "utm_medium", "utm_campaign", "utm_content", "utm_term", "share_channel_code",
+}
+
+# 🛒 Nhận diện shop_id/item_id của Shopee và item_id (+ sku_id của biến thể) của Lazada
+SHOPEE_PRODUCT_RE = re.compile(r"/product/(\d+)/(\d+)")
+SHOPEE_SLUG_RE = re.compile(r"-i\.(\d+)\.(\d+)")
+SHOPEE_SHOP_ITEM_RE = re.compile(r"^/[^/]+/(\d+)/(\d+)/?$")
+LAZADA_ITEM_RE = re.compile(r"-i(\d+)(?:-s(\d+))?\.html")
+
+
+def canonicalize_url(url):
+    """Chuẩn hoá URL sản phẩm: bỏ tracking params, chuẩn hoá shop_id/item_id."""
+    parts = urlsplit(url.strip())
+    return _canonicalize((parts.hostname or "").lower(), parts.path, parts.query)
+
+
+def _on_domain(host, domain):
+    """host là domain hoặc subdomain của domain ("evilshopee.vn" không thuộc "shopee.vn")."""
+    return host == domain or host.endswith("." + domain)
+
+
+def _canonicalize(host, path, query):
+    path = path or "/"
+    if _on_domain(host, "shopee.vn") and host != "s.shopee.vn":
+        match = SHOPEE_PRODUCT_RE.search(path) or SHOPEE_SLUG_RE.search(path) or SHOPEE_SHOP_ITEM_RE.search(path)
+        if match:
+            return f"https://shopee.vn/product/{match.group(1)}/{match.group(2)}"
+    elif _on_domain(host, "lazada.vn") and host != "s.lazada.vn":
+        match = LAZADA_ITEM_RE.search(path)
+        if match:
+            # Mỗi sku là một biến thể (màu, size...) với link affiliate riêng → giữ sku trong khoá
+            item_id, sku_id = match.groups()
+            suffix = f"-s{sku_id}" if sku_id else ""
+            return f"https://www.lazada.vn/products/i{item_id}{suffix}.html"
+
+    if not query:
+        return f"https://{host}{path.rstrip('/') or '/'}"
+    params = sorted(
+        (k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    return urlunsplit(("https", host, path.rstrip("/") or "/", urlencode(params), ""))
+
+
+class LinkRecord:
+    """Một URL đã phân loại: platform (None = link thường), link rút gọn hay không, cần expand không."""
+
+    __slots__ = ("url", "host", "platform", "is_short", "needs_expansion", "_rest", "_canonical_key")
+
+    def __init__(self, url, host, platform, is_short, needs_expansion, rest):
+        self.url = url
+        self.host = host
+        self.platform = platform
+        self.is_short = is_short
+        self.needs_expansion = needs_expansion
+        self._rest = rest  # phần sau host: path?query#fragment
+        self._canonical_key = None
+
+    @property
+    def canonical_key(self):
+        """URL sản phẩm chuẩn hoá (tính khi cần, dùng làm khoá bỏ trùng/cache)."""
+        if self._canonical_key is None:
+            path, _, query = self._rest.partition("#")[0].partition("?")
+            self._canonical_key = _canonicalize(self.host, path, query)
+        return self._canonical_key
+
+    @property
+    def is_affiliate(self):
+        return self.platform is not None
+
+    def __repr__(self):
+        return f"LinkRecord({self.url!r}, platform={self.platform!r}, short={self.is_short})"
+
+
+def _record(match):
+    url, host, rest = match.group(0), match.group(1).lower(), match.group(2)
+    stripped = url.rstrip(TRAILING_PUNCTUATION)
+    if len(stripped) != len(url):
+        rest = rest[:max(0, len(rest) - (len(url) - len(stripped)))]
+        url = stripped
+    platform, is_short, needs_expansion = HOSTS.get(host, (None, False, False))
+    if platform is not None and not rest.strip("/"):
+        # Chỉ có domain (trang chủ) → không phải link sản phẩm
+        platform, is_short, needs_expansion = None, False, False
+    return LinkRecord(url, host, platform, is_short, needs_expansion, rest)
+
+
+def normalize_link(link):
+    """Link người dùng gõ tay: hạ chữ thường scheme, thêm https:// cho host hỗ trợ thiếu scheme ("shopee.vn/...")."""
+    link = link.strip()
+    match = SCHEME_RE.match(link)
+    if match:
+        return match.group(1).lower() + link[len(match.group(1)):]
+    host = HOST_END_RE.split(link, 1)[0].lower()
+    if host in HOSTS:
+        return f"https://{link}"
+    return link
+
+
+def classify_url(url):
+    """Phân loại một URL (None nếu chuỗi không phải URL http/https)."""
+    match = URL_RE.match(url.strip())
+    return _record(match) if match else None
+
+
+def extract_links(text):
+    """Quét tin nhắn một lần, trả về LinkRecord cho mọi URL theo thứ tự xuất hiện."""
+    return [_record(match) for match in URL_RE.finditer(text)]
+
+
+def affiliate_links(text):
+    """Các link Shopee/Lazada trong tin nhắn, bỏ trùng theo sản phẩm (giữ thứ tự)."""
+    records = []
+    for match in URL_RE.finditer(text):
+        if match.group(1).lower() in HOSTS:
+            record = _record(match)
+            if record.platform is not None:
+                records.append(record)
+    if len(records) < 2:
+        return records
+    unique = {}
+    for record in records:
+        unique.setdefault((record.platform, record.canonical_key), record)
+    return list(unique.values())
@@ -0,0 +1,25 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(level="INFO"):
+    """Logging không chặn event loop: handler chỉ đẩy record vào queue, thread riêng ghi ra stdout."""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    # httpx ghi log INFO cho mọi request Bot API → chỉ giữ cảnh báo
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
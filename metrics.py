@@ -0,0 +1,184 @@
+import bisect
+import logging
+import time
+from collections import defaultdict
+
+from startup import startup_timer
+
+# ⏱️ Bucket (giây) cho histogram thời gian từng stage
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + inner + "}"
+
+
+class Histogram:
+    """Histogram kiểu Prometheus (bucket cộng dồn + sum + count), tách theo label."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts per bucket..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def percentile(self, q, **labels):
+        """Ước lượng phân vị từ bucket (cận trên của bucket chứa phân vị q)."""
+        series = self._series.get(tuple(sorted(labels.items())))
+        if not series or not series[-1]:
+            return None
+        target = q * series[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets, series):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Counter kiểu Prometheus, tách theo label."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = defaultdict(int)
+
+    def inc(self, amount=1, **labels):
+        self._values[tuple(sorted(labels.items()))] += amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []  # (name, help, callback → {labels_tuple: value} hoặc số)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, callback):
+        """Gauge đọc giá trị tại thời điểm scrape qua callback."""
+        self._gauges.append((name, help_text, callback))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, callback in self._gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                value = callback()
+            except Exception as e:
+                logging.error(f"❌ Lỗi đọc gauge {name}: {e}")
+                continue
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {item}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 📊 Registry + metric dùng chung cho bot
+registry = MetricsRegistry()
+stage_duration = registry.histogram("bot_stage_duration_seconds", "Thời gian xử lý theo stage")
+cache_events = registry.counter("bot_cache_events_total", "Cache hit/miss theo loại cache")
+fallbacks = registry.counter("bot_fallbacks_total", "Số lần dùng QR link gốc thay cho link affiliate")
+errors = registry.counter("bot_errors_total", "Lỗi theo platform và stage")
+messages = registry.counter("bot_messages_total", "Số tin nhắn đã xử lý theo loại")
+
+
+class span:
+    """Đo thời gian một stage: `with span("expand"): ...` (dùng được quanh await)."""
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_duration.observe(time.perf_counter() - self.started, stage=self.stage, **self.labels)
+        return False
+
+
+class MetricsServer:
+    """Endpoint /metrics (định dạng text Prometheus) trên HTTP local."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle_metrics(self, request):
+        web = startup_timer.lazy_import("aiohttp.web")
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        """Mở endpoint; trả False (bot vẫn chạy, không có metrics) nếu không bind được cổng."""
+        # aiohttp.web chỉ cần khi bật endpoint metrics
+        web = startup_timer.lazy_import("aiohttp.web")
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Cổng đã bị chiếm (vd. instance khác trên cùng host) → không chặn bot khởi động
+            logging.error(f"❌ Không mở được metrics tại {self.host}:{self.port}: {e}. Bot chạy tiếp không có /metrics")
+            await self.stop()
+            return False
+        logging.info(f"📊 Metrics tại http://{self.host}:{self.port}/metrics")
+        return True
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+from telegram.constants import ChatAction
+
+
+class ProgressPlaceholder:
+    """Báo "đang xử lý" thích ứng cho một tin nhắn.
+
+    Gửi ngay `sendChatAction` (rẻ, không tạo tin nhắn); chỉ gửi tin placeholder nếu
+    kết quả chưa xong sau `delay` giây. Việc nhanh (cache hit, QR thường) chỉ tốn
+    đúng một lần gửi kết quả.
+
+        async with ProgressPlaceholder(message, "Đang xử lý...", delay=1.5) as progress:
+            ...
+            await progress.finish("Kết quả")  # sửa placeholder, hoặc gửi mới nếu chưa có
+    """
+
+    def __init__(self, message, text, delay, action=ChatAction.UPLOAD_PHOTO):
+        self.message = message
+        self.text = text
+        self.delay = delay
+        self.action = action
+        self.placeholder = None
+        self.finished = False
+        self._sending = False
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self.finished:
+            await self.finish()
+        return False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await self.message.reply_chat_action(self.action)
+        except Exception as e:
+            logging.debug(f"sendChatAction lỗi: {type(e).__name__}: {e}")
+        await asyncio.sleep(max(0.0, self.delay - (loop.time() - started)))
+        self._sending = True
+        self.placeholder = await self.message.reply_text(self.text)
+
+    async def _settle(self):
+        """Dừng hẹn giờ; nếu placeholder đang được gửi thì chờ gửi xong để còn sửa/xoá."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if self._sending:
+            try:
+                await task
+            except Exception as e:
+                logging.warning(f"⚠️ Không gửi được tin đang xử lý: {type(e).__name__}: {e}")
+        else:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def update(self, text, **kwargs):
+        """Cập nhật nội dung placeholder (chỉ khi nó đã được gửi, không tốn thêm request nếu chưa)."""
+        if self.placeholder is not None:
+            await self.placeholder.edit_text(text, **kwargs)
+
+    async def finish(self, text=None, **kwargs):
+        """Kết thúc: có `text` → sửa placeholder thành text (hoặc gửi mới); không có → xoá placeholder.
+
+        Trả về tin nhắn chứa text (None nếu không có text).
+        """
+        self.finished = True
+        await self._settle()
+        if text is not None:
+            if self.placeholder is not None:
+                return await self.placeholder.edit_text(text, **kwargs)
+            return await self.message.reply_text(text, **kwargs)
+        if self.placeholder is not None:
+            placeholder, self.placeholder = self.placeholder, None
+            await placeholder.delete()
+        return None
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+from config import QR_CACHE_PATH, QR_CACHE_MAX_FILE_IDS, QR_CACHE_MAX_PNG_BYTES
+
+# Số khoá mỗi câu SELECT khi nạp snapshot (dưới giới hạn 999 tham số của SQLite cũ)
+RESTORE_CHUNK = 500
+
+
+def qr_key(content):
+    """Khoá cache QR theo hash nội dung."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class QRCache:
+    """Cache QR: file_id Telegram (RAM + SQLite) và LRU byte PNG cho QR chưa upload."""
+
+    def __init__(self, path=QR_CACHE_PATH, max_file_ids=QR_CACHE_MAX_FILE_IDS,
+                 max_png_bytes=QR_CACHE_MAX_PNG_BYTES):
+        self.path = path
+        self.max_file_ids = max_file_ids
+        self.max_png_bytes = max_png_bytes
+        self._file_ids = OrderedDict()  # key -> file_id
+        self._pngs = OrderedDict()      # key -> bytes
+        self._png_bytes = 0
+        self._db = None
+        self._writes = 0
+        self.file_id_hits = 0
+        self.png_hits = 0
+        self.renders = 0
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS qr_file_ids ("
+                " key TEXT PRIMARY KEY, file_id TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    # 📎 file_id đã upload lên Telegram
+    def get_file_id(self, key):
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            try:
+                row = self._connect().execute(
+                    "SELECT file_id FROM qr_file_ids WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.error(f"❌ Lỗi đọc QR cache: {e}")
+                row = None
+            if row is None:
+                return None
+            file_id = row[0]
+            self._remember_file_id(key, file_id)
+        else:
+            self._file_ids.move_to_end(key)
+        self.file_id_hits += 1
+        return file_id
+
+    def _remember_file_id(self, key, file_id):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    def set_file_id(self, key, file_id):
+        self._remember_file_id(key, file_id)
+        # Đã có file_id → không cần giữ byte PNG nữa
+        self.drop_png(key)
+        try:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO qr_file_ids (key, file_id, created_at) VALUES (?, ?, ?)",
+                (key, file_id, time.time()),
+            )
+            db.commit()
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Lỗi ghi QR cache: {e}")
+
+    def forget_file_id(self, key):
+        """Bỏ file_id không còn hợp lệ (Telegram từ chối)."""
+        self._file_ids.pop(key, None)
+        try:
+            db = self._connect()
+            db.execute("DELETE FROM qr_file_ids WHERE key = ?", (key,))
+            db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"❌ Lỗi xoá QR cache: {e}")
+
+    def evict(self):
+        """Giữ tối đa max_file_ids bản ghi mới nhất trong SQLite."""
+        db = self._connect()
+        (count,) = db.execute("SELECT COUNT(*) FROM qr_file_ids").fetchone()
+        if count > self.max_file_ids:
+            db.execute(
+                "DELETE FROM qr_file_ids WHERE rowid IN"
+                " (SELECT rowid FROM qr_file_ids ORDER BY created_at LIMIT ?)",
+                (count - self.max_file_ids,),
+            )
+            db.commit()
+
+    # 🖼️ Byte PNG đã render nhưng chưa upload
+    def get_png(self, key):
+        png = self._pngs.get(key)
+        if png is not None:
+            self._pngs.move_to_end(key)
+            self.png_hits += 1
+        return png
+
+    def put_png(self, key, png):
+        if len(png) > self.max_png_bytes:
+            return
+        self.drop_png(key)
+        self._pngs[key] = png
+        self._png_bytes += len(png)
+        while self._png_bytes > self.max_png_bytes:
+            _, old = self._pngs.popitem(last=False)
+            self._png_bytes -= len(old)
+
+    def drop_png(self, key):
+        png = self._pngs.pop(key, None)
+        if png is not None:
+            self._png_bytes -= len(png)
+
+    def snapshot(self):
+        """Khoá file_id đang nằm trong RAM (thứ tự LRU); byte PNG chưa upload không được lưu."""
+        return list(self._file_ids)
+
+    def restore(self, keys, age=0):
+        """Nạp lại vào RAM các file_id đang nóng trước khi restart (đọc SQLite theo lô `key IN (...)`)."""
+        db = self._connect()
+        keys = keys[-self.max_file_ids:]
+        found = {}
+        for start in range(0, len(keys), RESTORE_CHUNK):
+            chunk = keys[start:start + RESTORE_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(db.execute(
+                f"SELECT key, file_id FROM qr_file_ids WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        # Giữ đúng thứ tự LRU của snapshot
+        for key in keys:
+            if key in found:
+                self._remember_file_id(key, found[key])
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        return {
+            "file_ids": len(self._file_ids),
+            "file_id_hits": self.file_id_hits,
+            "png_items": len(self._pngs),
+            "png_bytes": self._png_bytes,
+            "png_hits": self.png_hits,
+            "renders": self.renders,
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import logging
+import sys
+import time
+from concurrent.futures import BrokenExecutor
+from contextlib import contextmanager
+
+# qrcode/PIL/multiprocessing chỉ được import khi render/khởi động pool lần đầu (giảm thời gian khởi động bot)
+from startup import startup_timer
+
+# 📐 Kích thước ảnh mục tiêu (px) - box_size được chọn theo số module của QR
+TARGET_IMAGE_SIZE = 500
+MIN_BOX_SIZE = 3
+MAX_BOX_SIZE = 10
+BORDER = 4
+
+# 🎭 Cố định mask pattern: bỏ qua bước thử cả 8 mask (chiếm phần lớn thời gian của qrcode.make),
+# mọi mask đều hợp lệ theo chuẩn và đọc được bởi máy quét
+MASK_PATTERN = 2
+
+
+def choose_error_correction(payload):
+    """Payload ngắn → nhiều dự phòng; payload dài → ít dự phòng để QR nhỏ, vẫn chứa đủ dữ liệu."""
+    constants = startup_timer.lazy_import("qrcode.constants")
+    size = len(payload.encode("utf-8"))
+    if size <= 64:
+        return constants.ERROR_CORRECT_Q
+    if size <= 512:
+        return constants.ERROR_CORRECT_M
+    return constants.ERROR_CORRECT_L
+
+
+def choose_box_size(modules):
+    """Chọn box_size để ảnh xấp xỉ TARGET_IMAGE_SIZE px."""
+    return max(MIN_BOX_SIZE, min(MAX_BOX_SIZE, TARGET_IMAGE_SIZE // (modules + 2 * BORDER)))
+
+
+def render_qr_png(payload):
+    """Render QR thành PNG 1-bit, nén nhẹ (chạy được trong process con)."""
+    qrcode = startup_timer.lazy_import("qrcode")
+    Image = startup_timer.lazy_import("PIL.Image")
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=choose_error_correction(payload),
+        border=BORDER,
+        mask_pattern=MASK_PATTERN,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()  # đã gồm border
+    modules = len(matrix)
+    box_size = choose_box_size(modules - 2 * BORDER)
+
+    # Dựng ảnh ở tỉ lệ 1 module = 1 px rồi phóng to NEAREST (nhanh hơn vẽ từng ô)
+    pixels = bytes(0 if cell else 255 for row in matrix for cell in row)
+    image = Image.frombytes("L", (modules, modules), pixels).convert("1")
+    image = image.resize((modules * box_size, modules * box_size), Image.NEAREST)
+
+    # Ảnh 1-bit rất nhỏ → nén tối đa chỉ tốn thêm ~1ms, file upload nhỏ hơn cách cũ (qrcode.make) ở mọi độ dài
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=9)
+    return buffer.getvalue()
+
+
+def _noop():
+    return None
+
+
+@contextmanager
+def _main_script_hidden():
+    """Ẩn script chính khi spawn process con.
+
+    Mặc định spawn chạy lại script chính (bot_telegram.py thành __mp_main__) trong mỗi process con:
+    nạp cả PTB, config, logging. Process render chỉ cần qr_engine nên không cần bước đó.
+    """
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+class QREngine:
+    """Render QR trong process pool riêng để không tranh GIL với event loop."""
+
+    def __init__(self, workers=2):
+        # workers = 0 → render trong thread pool mặc định
+        self.workers = workers
+        self._pool = None
+        self._warmup_task = None
+
+    def start(self):
+        if self._pool is None and self.workers > 0:
+            multiprocessing = startup_timer.lazy_import("multiprocessing")
+            process_pool = startup_timer.lazy_import("concurrent.futures.process")
+            context = multiprocessing.get_context("spawn")
+            self._pool = process_pool.ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            # Pool spawn process theo nhu cầu khi submit → spawn đủ số process ngay tại đây (lúc script chính đang ẩn),
+            # sau đó pool không spawn thêm process nào nữa
+            with _main_script_hidden():
+                for _ in range(self.workers):
+                    self._pool.submit(_noop)
+            logging.info(f"🖼️ QR engine: {self.workers} process")
+
+    def warmup(self):
+        """Khởi động process con và import qrcode/PIL trong nền, trước tin nhắn đầu tiên."""
+        self.start()
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self._warmup())
+
+    async def _warmup(self):
+        started = time.perf_counter()
+        try:
+            # Import qrcode/PIL trong từng process con
+            await asyncio.gather(*(self.render("warmup") for _ in range(max(1, self.workers))))
+            logging.info(f"🖼️ QR engine sẵn sàng sau {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            logging.warning(f"⚠️ Không warmup được QR engine: {type(e).__name__}: {e}")
+
+    def shutdown(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            self._warmup_task = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def stop(self):
+        """Dừng pool và chờ mọi process con thoát (chờ trong thread, không chặn event loop)."""
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            self._warmup_task = None
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, lambda: pool.shutdown(wait=True, cancel_futures=True))
+
+    async def render(self, payload):
+        """Render payload thành byte PNG."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, render_qr_png, payload)
+        except BrokenExecutor:
+            # Process con bị chết → tạo lại pool và thử lại một lần
+            logging.warning("⚠️ QR process pool bị hỏng, khởi tạo lại")
+            self.shutdown()
+            self.start()
+            return await loop.run_in_executor(self._pool, render_qr_png, payload)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urljoin, urlsplit
+
+from http_client import http_client, TIMEOUT_PROFILES
+from link_classifier import HOSTS
+
+# 🎯 Host đích: dừng ngay khi một hop trỏ tới host sản phẩm (không rút gọn) trong bảng HOSTS của link_classifier.
+# Host click/tracking khác (c.lazada.vn, pages.lazada.vn, ...) và link rút gọn vẫn được follow tiếp.
+TARGET_HOSTS = frozenset(host for host, (_, is_short, _) in HOSTS.items() if not is_short)
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# HEAD bị từ chối/không hỗ trợ → thử lại bằng GET (đóng ngay, không đọc body)
+HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 501}
+
+
+def is_target_host(url, target_hosts=TARGET_HOSTS):
+    return (urlsplit(url).hostname or "").lower() in target_hosts
+
+
+class ResolveResult:
+    """Kết quả resolve: URL cuối, có tới host đích không, và chi tiết từng hop."""
+
+    def __init__(self, url):
+        self.start_url = url
+        self.final_url = url
+        self.reached_target = False
+        self.hops = []  # [(url, method, status, latency_ms), ...]
+
+    @property
+    def hop_count(self):
+        return len(self.hops)
+
+    @property
+    def total_latency_ms(self):
+        return sum(hop[3] for hop in self.hops)
+
+
+class ResolverStats:
+    """Thống kê tích luỹ của resolver (số lần resolve, số hop, độ trễ)."""
+
+    def __init__(self):
+        self.resolves = 0
+        self.hops = 0
+        self.head_fallbacks = 0
+        self.total_latency_ms = 0.0
+
+    def record(self, result):
+        self.resolves += 1
+        self.hops += result.hop_count
+        self.total_latency_ms += result.total_latency_ms
+
+    def snapshot(self):
+        return {
+            "resolves": self.resolves,
+            "avg_hops": round(self.hops / self.resolves, 2) if self.resolves else 0,
+            "avg_hop_latency_ms": round(self.total_latency_ms / self.hops, 1) if self.hops else 0,
+            "head_fallbacks": self.head_fallbacks,
+        }
+
+
+resolver_stats = ResolverStats()
+
+
+async def _hop(url, headers):
+    """Một hop: HEAD trước, GET (đóng ngay) nếu HEAD không dùng được. Trả (method, status, location)."""
+    try:
+        async with http_client.request("HEAD", url, profile="expand", headers=headers,
+                                       allow_redirects=False) as response:
+            if response.status not in HEAD_FALLBACK_STATUSES:
+                return "HEAD", response.status, response.headers.get("Location")
+    except asyncio.TimeoutError:
+        raise
+    except Exception as e:
+        logging.debug(f"HEAD lỗi ({type(e).__name__}) → fallback GET: {url}")
+
+    resolver_stats.head_fallbacks += 1
+    async with http_client.get(url, profile="expand", headers=headers, allow_redirects=False) as response:
+        location = response.headers.get("Location")
+        # Không đọc body: đóng kết nối ngay
+        response.close()
+        return "GET", response.status, location
+
+
+async def _follow(result, headers, max_hops, target_hosts):
+    url = result.start_url
+    for _ in range(max_hops):
+        started = time.perf_counter()
+        method, status, location = await _hop(url, headers)
+        result.hops.append((url, method, status, round((time.perf_counter() - started) * 1000, 1)))
+
+        if status not in REDIRECT_STATUSES or not location:
+            break
+
+        url = urljoin(url, location)
+        result.final_url = url
+        if is_target_host(url, target_hosts):
+            result.reached_target = True
+            return result
+
+    result.reached_target = is_target_host(result.final_url, target_hosts)
+    return result
+
+
+async def resolve_redirects(url, headers=None, max_hops=15, target_hosts=TARGET_HOSTS, timeout=None):
+    """Follow header Location từng hop, dừng ngay khi tới host đích (không tải trang đích)."""
+    result = ResolveResult(url)
+    if timeout is None:
+        timeout = TIMEOUT_PROFILES["expand"].total
+    try:
+        await asyncio.wait_for(_follow(result, headers, max_hops, target_hosts), timeout)
+    finally:
+        resolver_stats.record(result)
+    return result
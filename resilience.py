@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Circuit đang mở: bỏ qua lời gọi, dùng đường fallback ngay."""
+
+
+class UpstreamError(Exception):
+    """Dịch vụ phía sau trả lỗi (5xx...) - tính là một lần lỗi của breaker."""
+
+
+class CircuitBreaker:
+    """Circuit breaker theo cửa sổ `window` lời gọi gần nhất.
+
+    - Lời gọi lỗi hoặc chậm hơn `slow_call_threshold` giây đều tính là "xấu"
+    - Mở khi tỉ lệ xấu >= `failure_rate` (cần ít nhất `min_calls` mẫu)
+    - Sau `open_seconds` chuyển half-open: cho một lời gọi thử, thành công → đóng, lỗi → mở lại
+    """
+
+    def __init__(self, name, window=20, min_calls=10, failure_rate=0.5, slow_call_threshold=3.0, open_seconds=30.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  # True = lời gọi xấu
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_inflight = False
+        return self._state
+
+    @property
+    def is_open(self):
+        """Đang mở (hoặc half-open đã có lời gọi thử) → caller nên fallback luôn."""
+        state = self.state
+        return state == OPEN or (state == HALF_OPEN and self._probe_inflight)
+
+    def allow(self):
+        """Xin phép gọi; ở half-open chỉ cho một lời gọi thử tại một thời điểm."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_inflight:
+            self._probe_inflight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def abandon(self):
+        """Lời gọi bị huỷ giữa chừng: trả lượt thử half-open, không tính kết quả."""
+        if self._state == HALF_OPEN:
+            self._probe_inflight = False
+
+    def record(self, ok, duration=0.0):
+        bad = not ok or duration > self.slow_call_threshold
+        if self._state == HALF_OPEN:
+            self._probe_inflight = False
+            if bad:
+                self._trip()
+            else:
+                self._state = CLOSED
+                self._outcomes.clear()
+                logging.info(f"✅ Circuit {self.name} đóng lại")
+            return
+
+        self._outcomes.append(bad)
+        if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+        logging.warning(f"🔌 Circuit {self.name} mở trong {self.open_seconds:.0f}s")
+
+    def stats(self):
+        bad = sum(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "failure_rate": round(bad / len(self._outcomes), 2) if self._outcomes else 0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Giữ `size` độ trễ thành công gần nhất để ước lượng p95."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, q):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Exponential backoff với full jitter: ngẫu nhiên trong [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class ResiliencePolicy:
+    """Breaker + retry có jitter + hedged request cho một dịch vụ.
+
+    `call(func)` nhận coroutine function không tham số; raise CircuitOpen khi breaker mở.
+    Retry/hedge chỉ nên bật cho lời gọi idempotent. Timeout không được retry
+    (đã chờ hết timeout thì retry chỉ làm người dùng chờ lâu thêm).
+    `call(func, hedge=False)` tắt hedge cho riêng lời gọi đó; `on_retry` (coroutine function)
+    chạy trước mỗi lần retry, ví dụ để trừ quota cho request gửi thêm.
+    """
+
+    def __init__(self, breaker, attempts=1, base_delay=0.1, max_delay=1.0,
+                 hedge=False, hedge_min_delay=0.2, hedge_max_delay=3.0, hedge_min_samples=20):
+        self.breaker = breaker
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self, hedge=None):
+        """Thời gian chờ trước khi gửi request thứ hai: p95 gần đây, kẹp trong [min, max]."""
+        if hedge is None:
+            hedge = self.hedge
+        if not hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, self.latency.percentile(0.95)))
+
+    async def call(self, func, hedge=None, on_retry=None):
+        for attempt in range(self.attempts):
+            if not self.breaker.allow():
+                raise CircuitOpen(self.breaker.name)
+            started = time.monotonic()
+            try:
+                result = await self._hedged(func, hedge)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                self.breaker.record(False)
+                if attempt + 1 >= self.attempts or isinstance(e, asyncio.TimeoutError):
+                    raise
+                self.retries += 1
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                logging.debug(f"🔁 Retry {self.breaker.name} sau {delay * 1000:.0f}ms ({type(e).__name__})")
+                await asyncio.sleep(delay)
+                if on_retry is not None:
+                    await on_retry()
+                continue
+            duration = time.monotonic() - started
+            self.breaker.record(True, duration)
+            self.latency.add(duration)
+            return result
+
+    async def _hedged(self, func, hedge=None):
+        delay = self.hedge_delay(hedge)
+        if delay is None:
+            return await func()
+
+        primary = asyncio.ensure_future(func())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                # Request đầu chậm hơn p95 → gửi thêm một request, lấy kết quả thành công đầu tiên
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(func()))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        stats = self.breaker.stats()
+        p95 = self.latency.percentile(0.95)
+        stats.update({
+            "p95_ms": None if p95 is None else round(p95 * 1000),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        })
+        return stats
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from collections import deque, defaultdict
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """Token bucket: `try_acquire`/`available` trả False ngay khi hết token, `acquire` chờ tới khi có token."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate          # token nạp lại mỗi giây
+        self.capacity = capacity  # số token tối đa (burst)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self.granted = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            self.granted += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def available(self, tokens=1):
+        """Còn đủ token hay không (không trừ token): đường tương tác kiểm tra trước, request thật mới trừ."""
+        self._refill()
+        if self._tokens >= tokens:
+            return True
+        self.rejected += 1
+        return False
+
+    async def acquire(self, tokens=1, reserve=0):
+        """Chờ tới khi đủ token (mỗi request gửi đi AccessTrade trừ một token).
+
+        `reserve`: số token luôn chừa lại cho việc ưu tiên hơn (việc nền chỉ dùng phần vượt quá).
+        """
+        reserve = min(reserve, self.capacity - tokens)
+        while True:
+            self._refill()
+            if self._tokens - reserve >= tokens:
+                self._tokens -= tokens
+                self.granted += 1
+                return
+            await asyncio.sleep((tokens + reserve - self._tokens) / self.rate)
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+
+class SchedulerFull(Exception):
+    """Hàng đợi của chat đã đầy."""
+
+
+class _Waiter:
+    __slots__ = ("chat_id", "user_id", "future", "enqueued_at")
+
+    def __init__(self, chat_id, user_id, future):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    """Giới hạn số việc chạy đồng thời (toàn cục / mỗi chat / mỗi user), chia lượt round-robin giữa các chat.
+
+    Một chat spam chỉ chiếm tối đa `chat_limit` slot; các chat khác vẫn được phục vụ xen kẽ.
+    `chat_limit=1`: việc trong một chat chạy tuần tự đúng thứ tự đến (việc sau không vượt việc đầu hàng).
+    """
+
+    def __init__(self, global_limit=16, chat_limit=2, user_limit=2, chat_queue_limit=50):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.user_limit = user_limit
+        self.chat_queue_limit = chat_queue_limit
+        self._active = 0
+        self._chat_active = defaultdict(int)
+        self._user_active = defaultdict(int)
+        self._queues = {}       # chat_id -> deque[_Waiter]
+        self._rotation = deque()  # thứ tự round-robin các chat đang có việc chờ
+        self.completed = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _can_run(self, chat_id, user_id):
+        return (
+            self._active < self.global_limit
+            and self._chat_active[chat_id] < self.chat_limit
+            and self._user_active[user_id] < self.user_limit
+        )
+
+    def _grant(self, chat_id, user_id):
+        self._active += 1
+        self._chat_active[chat_id] += 1
+        self._user_active[user_id] += 1
+
+    def _release(self, chat_id, user_id):
+        self._active -= 1
+        self._chat_active[chat_id] -= 1
+        if not self._chat_active[chat_id]:
+            del self._chat_active[chat_id]
+        self._user_active[user_id] -= 1
+        if not self._user_active[user_id]:
+            del self._user_active[user_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Chia slot trống cho các chat theo vòng, mỗi lượt tối đa một việc / chat."""
+        for _ in range(len(self._rotation)):
+            if self._active >= self.global_limit:
+                return
+            chat_id = self._rotation[0]
+            self._rotation.rotate(-1)
+            queue = self._queues[chat_id]
+            for waiter in list(queue):
+                if waiter.future.done():
+                    queue.remove(waiter)
+                elif self._can_run(waiter.chat_id, waiter.user_id):
+                    queue.remove(waiter)
+                    self._grant(waiter.chat_id, waiter.user_id)
+                    waiter.future.set_result(None)
+                    break
+                elif self.chat_limit == 1:
+                    # Việc đầu hàng chưa chạy được (user đang bận ở chat khác) → giữ thứ tự, không cho việc sau vượt
+                    break
+            if not queue:
+                del self._queues[chat_id]
+                self._rotation.remove(chat_id)
+
+    async def _acquire(self, chat_id, user_id):
+        if chat_id not in self._queues and self._can_run(chat_id, user_id):
+            self._grant(chat_id, user_id)
+            return 0.0
+
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._rotation.append(chat_id)
+        if len(queue) >= self.chat_queue_limit:
+            self.dropped += 1
+            raise SchedulerFull(chat_id)
+
+        waiter = _Waiter(chat_id, user_id, asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Đã được cấp slot nhưng caller bị huỷ → trả lại slot
+                self._release(chat_id, user_id)
+            raise
+        return time.monotonic() - waiter.enqueued_at
+
+    @asynccontextmanager
+    async def slot(self, chat_id, user_id=None):
+        """Chờ tới lượt của chat rồi giữ một slot trong suốt khối `async with`."""
+        wait = await self._acquire(chat_id, user_id)
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        try:
+            yield wait
+        finally:
+            self.completed += 1
+            self._release(chat_id, user_id)
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "waiting_chats": len(self._queues),
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 1) if self.completed else 0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import Counter
+
+from config import SHORTEN_BATCH_WINDOW_MS, SHORTEN_BATCH_MAX_SIZE
+
+
+class ShortenBatcher:
+    """Gom các yêu cầu rút gọn đồng thời cùng campaign thành một lần gọi product_link/create.
+
+    `send_batch(campaign_id, urls)` là coroutine gọi API và trả về JSON của AccessTrade.
+    Có `acquire` (coroutine chờ quota): batch chỉ được chốt sau khi có token, URL đến trong lúc
+    chờ token vẫn vào batch (tối đa `max_batch_size`) → quota càng chặt, batch càng đầy.
+    """
+
+    def __init__(self, send_batch, window_ms=SHORTEN_BATCH_WINDOW_MS, max_batch_size=SHORTEN_BATCH_MAX_SIZE,
+                 acquire=None):
+        self.send_batch = send_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.acquire = acquire
+        self._pending = {}  # campaign_id -> {url: [future, ...]}
+        self._timers = {}   # campaign_id -> TimerHandle
+        self._flushers = {}  # campaign_id -> Task chờ token rồi gửi batch (khi có acquire)
+        self._tasks = set()
+        # 📊 Thống kê kích thước batch thực tế: {size: số lần gửi}
+        self.batch_sizes = Counter()
+
+    async def submit(self, campaign_id, url):
+        """Đưa một URL vào batch của campaign và chờ short_link (None nếu lỗi)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(campaign_id, {})
+        batch.setdefault(url, []).append(future)
+
+        if self.acquire is not None:
+            if campaign_id not in self._flushers:
+                self._start_flusher(campaign_id)
+        elif len(batch) >= self.max_batch_size:
+            self._flush_now(campaign_id)
+        elif campaign_id not in self._timers:
+            self._timers[campaign_id] = loop.call_later(self.window, self._flush_now, campaign_id)
+
+        return await future
+
+    def _flush_now(self, campaign_id):
+        timer = self._timers.pop(campaign_id, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(campaign_id, None)
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(campaign_id, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _start_flusher(self, campaign_id):
+        task = asyncio.get_running_loop().create_task(self._acquire_and_flush(campaign_id))
+        self._flushers[campaign_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _acquire_and_flush(self, campaign_id):
+        """Chờ cửa sổ gom rồi chờ token; chốt tối đa max_batch_size URL, phần dư chờ token kế tiếp."""
+        try:
+            await asyncio.sleep(self.window)
+            await self.acquire()
+        except Exception as e:
+            logging.error(f"❌ Lỗi chờ quota rút gọn: {type(e).__name__}: {e}")
+            self._flushers.pop(campaign_id, None)
+            for futures in self._pending.pop(campaign_id, {}).values():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(None)
+            return
+        self._flushers.pop(campaign_id, None)
+
+        batch = self._pending.pop(campaign_id, {})
+        if len(batch) > self.max_batch_size:
+            overflow = list(batch)[self.max_batch_size:]
+            self._pending[campaign_id] = {url: batch.pop(url) for url in overflow}
+            self._start_flusher(campaign_id)
+        if batch:
+            await self._send(campaign_id, batch)
+
+    async def _send(self, campaign_id, batch):
+        urls = list(batch)
+        self.batch_sizes[len(urls)] += 1
+        logging.info(f"📦 Gửi batch product_link/create: campaign={campaign_id}, {len(urls)} link")
+
+        try:
+            json_data = await self.send_batch(campaign_id, urls)
+            results = self._route_results(urls, json_data)
+        except Exception as e:
+            logging.error(f"❌ Lỗi gửi batch rút gọn: {type(e).__name__}: {e}")
+            results = {}
+
+        for url, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(url))
+
+    @staticmethod
+    def _route_results(urls, json_data):
+        """Ghép từng success_link / error_link về đúng URL gốc."""
+        if not json_data or not json_data.get("success"):
+            logging.warning(f"❌ API trả về success=false cho batch: {json_data}")
+            return {}
+
+        data = json_data.get("data") or {}
+        success_links = data.get("success_link") or []
+        results = {}
+        unmatched = []
+        for entry in success_links:
+            origin = entry.get("url_origin")
+            if origin in urls and origin not in results:
+                results[origin] = entry.get("short_link")
+            else:
+                unmatched.append(entry)
+
+        for entry in data.get("error_link") or []:
+            logging.warning(f"⚠️ AccessTrade từ chối link {entry.get('url_origin')}: {entry.get('message')}")
+
+        # API có thể chuẩn hoá url_origin → ghép theo thứ tự khi số lượng khớp hoàn toàn
+        if unmatched and len(success_links) == len(urls):
+            for url, entry in zip(urls, success_links):
+                results.setdefault(url, entry.get("short_link"))
+
+        return results
+
+    def stats(self):
+        """Thống kê batch: số batch, số link, kích thước trung bình và phân bố."""
+        batches = sum(self.batch_sizes.values())
+        links = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "batches": batches,
+            "links": links,
+            "avg_batch_size": round(links / batches, 2) if batches else 0,
+            "sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,30 @@
+import asyncio
+
+
+class SingleFlight:
+    """Gộp các lời gọi đồng thời cùng key thành một lần chạy duy nhất."""
+
+    def __init__(self):
+        self._inflight = {}  # key -> Task
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, func):
+        """Chạy `func()` cho key, hoặc chờ chung kết quả nếu key đang được xử lý."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.shared += 1
+        # shield: một caller bị huỷ không làm huỷ request dùng chung
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __len__(self):
+        return len(self._inflight)
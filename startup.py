@@ -0,0 +1,48 @@
+import importlib
+import logging
+import sys
+import time
+
+
+class StartupTimer:
+    """Đo thời gian khởi động theo phase (import, build, initialize, ...) và các module nạp lười."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []        # (tên phase, giây)
+        self.lazy_imports = {}  # module -> giây import lần đầu
+
+    def mark(self, name):
+        """Kết thúc phase `name` (tính từ lần mark trước)."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def lazy_import(self, name):
+        """Import module ở lần dùng đầu tiên, ghi lại thời gian import."""
+        module = sys.modules.get(name)
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(name)
+            self.lazy_imports[name] = time.perf_counter() - started
+        return module
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        logging.info(f"⏱️ Khởi động xong sau {self.total * 1000:.0f}ms ({phases})")
+
+    def stats(self):
+        return {
+            "total_ms": round(self.total * 1000),
+            "phases_ms": {name: round(seconds * 1000) for name, seconds in self.phases},
+            "lazy_imports_ms": {name: round(seconds * 1000) for name, seconds in self.lazy_imports.items()},
+        }
+
+
+# Tạo khi module được import lần đầu → import startup trước các module nặng
+startup_timer = StartupTimer()
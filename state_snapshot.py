@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import time
+
+
+class StateSnapshot:
+    """Snapshot trạng thái nóng (JSON) ghi khi bot dừng, nạp lại khi khởi động.
+
+    Mỗi thành phần tự cung cấp `snapshot()` → dữ liệu JSON và `restore(data, age)`;
+    snapshot cũ hơn `max_age` giây hoặc bị hỏng được bỏ qua.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path, max_age=3600):
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, components):
+        """Ghi snapshot của mọi thành phần (ghi file tạm rồi đổi tên → không để lại file dở)."""
+        sections = {}
+        for name, component in components.items():
+            try:
+                sections[name] = component.snapshot()
+            except Exception as e:
+                logging.error(f"❌ Lỗi snapshot {name}: {type(e).__name__}: {e}")
+        data = {"version": self.VERSION, "saved_at": time.time(), "sections": sections}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.error(f"❌ Không ghi được snapshot {self.path}: {e}")
+            return False
+        logging.info(f"💾 Đã ghi snapshot trạng thái: {', '.join(sections)}")
+        return True
+
+    def load(self, components):
+        """Nạp snapshot vào các thành phần; trả về tên các phần đã nạp."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Bỏ qua snapshot hỏng {self.path}: {e}")
+            return []
+
+        age = time.time() - data.get("saved_at", 0)
+        if data.get("version") != self.VERSION or not 0 <= age <= self.max_age:
+            logging.info(f"ℹ️ Bỏ qua snapshot cũ ({age:.0f}s)")
+            return []
+
+        restored = []
+        for name, section in data.get("sections", {}).items():
+            component = components.get(name)
+            if component is None:
+                continue
+            try:
+                component.restore(section, age)
+                restored.append(name)
+            except Exception as e:
+                logging.error(f"❌ Lỗi nạp snapshot {name}: {type(e).__name__}: {e}")
+        logging.info(f"♻️ Đã nạp snapshot trạng thái ({age:.0f}s trước): {', '.join(restored)}")
+        return restored
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# config.py yêu cầu token khi import → đặt giá trị giả cho unit test (không gọi mạng)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("ACCESSTRADE_TOKEN", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
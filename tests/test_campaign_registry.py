@@ -0,0 +1,54 @@
+import asyncio
+
+import campaign_registry
+from campaign_registry import CampaignRegistry
+
+
+class FlakyFetch:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("down")
+        return [{"merchant": "shopee", "id": "S1"}, {"merchant": "lazadacps", "id": "L1"}]
+
+
+def test_failed_prewarm_retries_after_negative_ttl(monkeypatch):
+    fetch = FlakyFetch(failures=1)
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(campaign_registry.asyncio, "sleep", fake_sleep)
+
+    async def main():
+        registry = CampaignRegistry(fetch, refresh_interval=3600, negative_ttl=300)
+        await registry.start()
+        assert registry.stats()["failures"] == 1
+        while len(delays) < 2:
+            await real_sleep(0)
+        await registry.stop()
+        return registry
+
+    registry = asyncio.run(main())
+    # Lần thử lại sau prewarm lỗi chờ negative_ttl, không phải cả refresh_interval
+    assert 0 < delays[0] <= 300
+    assert delays[1] > 3000
+    assert registry.stats()["campaigns"] == {"shopee": "S1", "lazada": "L1"}
+
+
+def test_concurrent_gets_share_one_fetch():
+    fetch = FlakyFetch(failures=0)
+
+    async def main():
+        registry = CampaignRegistry(fetch)
+        return await asyncio.gather(registry.get("shopee"), registry.get("lazada"), registry.get("tiki"))
+
+    assert asyncio.run(main()) == ["S1", "L1", None]
+    assert fetch.calls == 1
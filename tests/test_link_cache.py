@@ -0,0 +1,41 @@
+import time
+
+from link_cache import RESTORE_CHUNK, LinkCache
+
+
+def test_restore_batches_many_keys_and_keeps_lru_order(tmp_path):
+    cache = LinkCache(path=str(tmp_path / "links.db"), ttl=3600, memory_size=5000)
+    db = cache._connect()
+    now = time.time()
+    count = RESTORE_CHUNK * 2 + 7
+    db.executemany(
+        "INSERT INTO links (platform, key, short_link, expanded_url, created_at) VALUES (?, ?, ?, ?, ?)",
+        [("shopee", f"https://shopee.vn/product/1/{i}", f"https://s/{i}", None, now) for i in range(count)],
+    )
+    db.execute(
+        "INSERT INTO links (platform, key, short_link, expanded_url, created_at) VALUES (?, ?, ?, ?, ?)",
+        ("lazada", "https://old", "https://s/old", None, now - 7200),
+    )
+    db.commit()
+
+    keys = [["shopee", f"https://shopee.vn/product/1/{i}"] for i in reversed(range(count))]
+    keys += [["lazada", "https://old"], ["lazada", "https://missing"]]
+    cache.restore(keys)
+
+    # Bản ghi hết hạn và khoá không có trong SQLite bị bỏ qua; thứ tự LRU giữ như snapshot
+    assert cache.snapshot() == keys[:count]
+    assert cache.get("shopee", "https://shopee.vn/product/1/3") == ("https://s/3", None)
+    cache.close()
+
+
+def test_restore_keeps_only_newest_keys_that_fit_in_memory(tmp_path):
+    cache = LinkCache(path=str(tmp_path / "links.db"), ttl=3600, memory_size=2)
+    for i in range(3):
+        cache.set("shopee", f"https://shopee.vn/product/1/{i}", f"https://s/{i}")
+    keys = cache.snapshot()
+    cache.close()
+
+    restored = LinkCache(path=str(tmp_path / "links.db"), ttl=3600, memory_size=2)
+    restored.restore(keys)
+    assert restored.snapshot() == keys[-2:]
+    restored.close()
@@ -0,0 +1,114 @@
+import pytest
+
+from link_classifier import affiliate_links, canonicalize_url, classify_url, extract_links, normalize_link
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.lazada.vn/products/ao-thun-i123-s456.html?spm=a2o4n", "https://www.lazada.vn/products/i123-s456.html"),
+    ("https://m.lazada.vn/products/ao-thun-i123-s456.html", "https://www.lazada.vn/products/i123-s456.html"),
+    ("https://www.lazada.vn/products/ao-thun-i123.html", "https://www.lazada.vn/products/i123.html"),
+])
+def test_lazada_canonical_keeps_sku(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_lazada_variants_have_different_keys():
+    assert canonicalize_url("https://www.lazada.vn/products/x-i123-s456.html") != \
+        canonicalize_url("https://www.lazada.vn/products/x-i123-s789.html")
+
+
+def test_lazada_variants_are_not_deduplicated():
+    text = "https://www.lazada.vn/products/x-i123-s456.html https://www.lazada.vn/products/x-i123-s789.html"
+    assert len(affiliate_links(text)) == 2
+
+
+@pytest.mark.parametrize("url", [
+    "https://evilshopee.vn/product/1/2",
+    "https://notlazada.vn/products/x-i123-s456.html",
+])
+def test_lookalike_domains_are_not_canonicalized_as_products(url):
+    canonical = canonicalize_url(url)
+    assert not canonical.startswith(("https://shopee.vn/", "https://www.lazada.vn/"))
+
+
+@pytest.mark.parametrize("url, platform, is_short, needs_expansion", [
+    ("https://shopee.vn/abc-i.1.2", "shopee", False, False),
+    ("https://www.shopee.vn/abc-i.1.2", "shopee", False, False),
+    ("https://s.shopee.vn/AbC123", "shopee", True, True),
+    ("https://vn.shp.ee/AbC123", "shopee", True, False),
+    ("https://shp.ee/AbC123", "shopee", True, False),
+    ("https://www.lazada.vn/products/x-i1.html", "lazada", False, False),
+    ("https://m.lazada.vn/products/x-i1.html", "lazada", False, False),
+    ("https://s.lazada.vn/s.AbC", "lazada", True, True),
+    ("https://lzd.co/AbC", "lazada", True, True),
+    ("https://SHOPEE.VN/abc-i.1.2", "shopee", False, False),
+])
+def test_host_table(url, platform, is_short, needs_expansion):
+    record = classify_url(url)
+    assert (record.platform, record.is_short, record.needs_expansion) == (platform, is_short, needs_expansion)
+
+
+@pytest.mark.parametrize("url", [
+    "https://mall.shopee.vn/abc-i.1.2",   # subdomain không có trong bảng HOSTS
+    "https://evilshopee.vn/abc-i.1.2",
+    "https://shopee.vn.evil.com/abc-i.1.2",
+    "https://example.com/?u=shopee.vn",
+])
+def test_unknown_hosts_are_plain_links(url):
+    assert classify_url(url).platform is None
+
+
+@pytest.mark.parametrize("url", ["https://shopee.vn", "https://shopee.vn/", "https://www.lazada.vn//"])
+def test_homepage_is_not_a_product_link(url):
+    assert classify_url(url).platform is None
+    assert affiliate_links(url) == []
+
+
+def test_trailing_punctuation_is_stripped():
+    records = extract_links("Xem (https://shopee.vn/abc-i.1.2). Hoặc https://lzd.co/AbC!")
+    assert [record.url for record in records] == ["https://shopee.vn/abc-i.1.2", "https://lzd.co/AbC"]
+
+
+def test_url_inside_query_string_is_not_extracted():
+    text = "https://example.com/redirect?to=https://shopee.vn/abc-i.1.2"
+    assert [record.url for record in extract_links(text)] == [text]
+    assert affiliate_links(text) == []
+
+
+def test_affiliate_links_dedups_same_product_and_keeps_order():
+    text = ("https://lzd.co/AbC https://shopee.vn/abc-i.1.2?sp_atk=x "
+            "https://shopee.vn/product/1/2 https://example.com/x")
+    assert [record.url for record in affiliate_links(text)] == [
+        "https://lzd.co/AbC", "https://shopee.vn/abc-i.1.2?sp_atk=x",
+    ]
+
+
+@pytest.mark.parametrize("url", [
+    "https://shopee.vn/Ao-thun-i.123.456?sp_atk=abc&xptdk=1",
+    "https://www.shopee.vn/product/123/456",
+    "https://shopee.vn/shopname/123/456/",
+])
+def test_shopee_canonical_form(url):
+    assert canonicalize_url(url) == "https://shopee.vn/product/123/456"
+
+
+def test_non_product_canonical_drops_tracking_and_sorts_query():
+    assert canonicalize_url("https://shopee.vn/search/?utm_source=x&keyword=ao&spm=1&a=2") == \
+        "https://shopee.vn/search?a=2&keyword=ao"
+
+
+@pytest.mark.parametrize("link, expected", [
+    ("shopee.vn/abc-i.1.2", "https://shopee.vn/abc-i.1.2"),
+    ("S.Lazada.vn/s.AbC", "https://S.Lazada.vn/s.AbC"),
+    ("HTTPS://shopee.vn/abc-i.1.2", "https://shopee.vn/abc-i.1.2"),
+    ("Http://lzd.co/AbC", "http://lzd.co/AbC"),
+    ("example.com/abc", "example.com/abc"),
+    ("xin chào", "xin chào"),
+])
+def test_normalize_link(link, expected):
+    assert normalize_link(link) == expected
+
+
+def test_schemeless_rutgon_link_is_affiliate():
+    records = affiliate_links(normalize_link("shopee.vn/abc-i.1.2"))
+    assert [(record.url, record.platform) for record in records] == [("https://shopee.vn/abc-i.1.2", "shopee")]
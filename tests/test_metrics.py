@@ -0,0 +1,29 @@
+import asyncio
+import socket
+
+from metrics import MetricsServer
+
+
+def test_port_in_use_does_not_abort_startup():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+
+        async def main():
+            server = MetricsServer("127.0.0.1", port)
+            started = await server.start()
+            await server.stop()
+            return started
+
+        assert asyncio.run(main()) is False
+
+
+def test_free_port_serves_metrics():
+    async def main():
+        server = MetricsServer("127.0.0.1", 0)
+        started = await server.start()
+        await server.stop()
+        return started
+
+    assert asyncio.run(main()) is True
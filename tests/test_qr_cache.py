@@ -0,0 +1,18 @@
+from qr_cache import RESTORE_CHUNK, QRCache, qr_key
+
+
+def test_restore_batches_many_keys_and_keeps_lru_order(tmp_path):
+    path = str(tmp_path / "qr.db")
+    count = RESTORE_CHUNK * 2 + 3
+    cache = QRCache(path=path, max_file_ids=5000)
+    keys = [qr_key(f"https://s/{i}") for i in range(count)]
+    for i, key in enumerate(keys):
+        cache.set_file_id(key, f"file-{i}")
+    cache.close()
+
+    restored = QRCache(path=path, max_file_ids=5000)
+    snapshot = list(reversed(keys)) + [qr_key("chưa từng upload")]
+    restored.restore(snapshot)
+    assert restored.snapshot() == snapshot[:count]
+    assert restored.get_file_id(keys[0]) == "file-0"
+    restored.close()
@@ -0,0 +1,26 @@
+import pytest
+
+from link_classifier import classify_url
+from redirect_resolver import is_target_host
+
+
+@pytest.mark.parametrize("url", [
+    "https://shopee.vn/product/1/2",
+    "https://www.lazada.vn/products/san-pham-i123-s456.html",
+    "https://m.lazada.vn/products/i123.html",
+])
+def test_stops_on_product_hosts_the_classifier_accepts(url):
+    assert is_target_host(url)
+    assert classify_url(url).platform is not None
+
+
+@pytest.mark.parametrize("url", [
+    "https://c.lazada.vn/t/c.abc123",
+    "https://pages.lazada.vn/wow/i/vn/landing",
+    "https://s.shopee.vn/AbC123",
+    "https://s.lazada.vn/s.Zx9",
+    "https://lzd.co/Xy7Z",
+    "https://example.com/?u=https://shopee.vn/product/1/2",
+])
+def test_follows_tracking_and_short_hosts(url):
+    assert not is_target_host(url)
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, ResiliencePolicy, UpstreamError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def tripped_breaker(**kwargs):
+    breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, open_seconds=30, **kwargs)
+    for ok in (True, True, False, False):
+        breaker.record(ok)
+    return breaker
+
+
+def test_breaker_trips_on_failure_rate(clock):
+    breaker = tripped_breaker()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("test", window=2, min_calls=2, slow_call_threshold=1.0)
+    breaker.record(True, duration=2.0)
+    breaker.record(True, duration=2.0)
+    assert breaker.state == "open"
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = tripped_breaker()
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert not breaker.is_open
+    assert breaker.allow()
+    # Đang có lời gọi thử → các lời gọi khác fallback
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(clock):
+    breaker = tripped_breaker()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = tripped_breaker()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = tripped_breaker()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+class Flaky:
+    """Lỗi `failures` lần đầu rồi trả "ok"."""
+
+    def __init__(self, failures, error=UpstreamError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("boom")
+        return "ok"
+
+
+def make_policy(**kwargs):
+    breaker = CircuitBreaker("test", window=10, min_calls=10)
+    return ResiliencePolicy(breaker, base_delay=0, max_delay=0, **kwargs)
+
+
+def test_retry_until_success_and_on_retry_hook():
+    policy = make_policy(attempts=3)
+    func = Flaky(failures=2)
+    charged = []
+
+    async def on_retry():
+        charged.append(1)
+
+    assert asyncio.run(policy.call(func, on_retry=on_retry)) == "ok"
+    assert func.calls == 3
+    assert policy.retries == 2
+    assert len(charged) == 2
+
+
+def test_gives_up_after_attempts():
+    policy = make_policy(attempts=2)
+    func = Flaky(failures=5)
+    with pytest.raises(UpstreamError):
+        asyncio.run(policy.call(func))
+    assert func.calls == 2
+
+
+def test_timeout_is_not_retried():
+    policy = make_policy(attempts=3)
+    func = Flaky(failures=5, error=asyncio.TimeoutError)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.call(func))
+    assert func.calls == 1
+
+
+def test_open_circuit_raises_without_calling():
+    policy = make_policy(attempts=3)
+    policy.breaker._trip()
+    func = Flaky(failures=0)
+    with pytest.raises(CircuitOpen):
+        asyncio.run(policy.call(func))
+    assert func.calls == 0
+
+
+class SlowThenFast:
+    """Request đầu treo tới khi bị huỷ, các request sau trả lời ngay."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return f"reply-{self.calls}"
+
+
+def hedging_policy():
+    policy = make_policy(hedge=True, hedge_min_delay=0.01, hedge_max_delay=0.01, hedge_min_samples=1)
+    policy.latency.add(0.001)
+    return policy
+
+
+def test_hedge_wins_and_cancels_slow_request():
+    policy = hedging_policy()
+    func = SlowThenFast()
+
+    async def main():
+        result = await policy.call(func)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "reply-2"
+    assert policy.hedges == 1
+    assert policy.hedge_wins == 1
+    assert func.cancelled == 1
+
+
+def test_hedge_can_be_disabled_per_call():
+    policy = hedging_policy()
+    func = SlowThenFast()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(policy.call(func, hedge=False), timeout=0.05)
+
+    asyncio.run(main())
+    assert func.calls == 1
+    assert policy.hedges == 0
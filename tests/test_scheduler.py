@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, SchedulerFull, TokenBucket
+
+
+def test_available_checks_without_consuming():
+    bucket = TokenBucket(rate=0.001, capacity=2)
+    assert bucket.available()
+    assert bucket.available()
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.available()
+    assert not bucket.try_acquire()
+    assert bucket.rejected == 2
+    assert bucket.granted == 2
+
+
+def test_acquire_waits_for_refill():
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    async def main():
+        await bucket.acquire()
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+
+    asyncio.run(main())
+    assert bucket.granted == 2
+
+
+async def run_jobs(scheduler, jobs, order):
+    """jobs: danh sách (tên, chat_id, user_id); mỗi việc giữ slot tới lượt event loop kế tiếp."""
+    async def job(name, chat_id, user_id):
+        async with scheduler.slot(chat_id, user_id):
+            order.append(name)
+            await asyncio.sleep(0.001)
+
+    tasks = []
+    for name, chat_id, user_id in jobs:
+        tasks.append(asyncio.create_task(job(name, chat_id, user_id)))
+        await asyncio.sleep(0)  # giữ thứ tự vào hàng đợi
+    await asyncio.gather(*tasks)
+
+
+def test_round_robin_between_chats():
+    scheduler = FairScheduler(global_limit=1, chat_limit=1, user_limit=10)
+    order = []
+    jobs = [(f"a{i}", "A", 1) for i in range(4)] + [("b0", "B", 2)]
+    asyncio.run(run_jobs(scheduler, jobs, order))
+    # Chat B không phải chờ cả hàng đợi của A
+    assert order == ["a0", "a1", "b0", "a2", "a3"]
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.completed == 5
+
+
+def test_chat_limit_lets_other_chats_run():
+    scheduler = FairScheduler(global_limit=10, chat_limit=1, user_limit=10)
+    running = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold(chat_id):
+            async with scheduler.slot(chat_id, chat_id):
+                running.append(chat_id)
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold(chat_id)) for chat_id in ("A", "A", "B")]
+        await asyncio.sleep(0.01)
+        snapshot = sorted(running)
+        release.set()
+        await asyncio.gather(*tasks)
+        return snapshot
+
+    assert asyncio.run(main()) == ["A", "B"]
+
+
+def test_user_limit_spans_chats():
+    scheduler = FairScheduler(global_limit=10, chat_limit=10, user_limit=1)
+
+    async def main():
+        async with scheduler.slot("A", 7):
+            waiter = asyncio.create_task(scheduler._acquire("B", 7))
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+        await asyncio.wait_for(waiter, timeout=1)
+        scheduler._release("B", 7)
+
+    asyncio.run(main())
+
+
+def test_full_chat_queue_raises():
+    scheduler = FairScheduler(global_limit=1, chat_limit=1, user_limit=10, chat_queue_limit=1)
+
+    async def main():
+        async with scheduler.slot("A", 1):
+            queued = asyncio.create_task(scheduler._acquire("A", 1))
+            await asyncio.sleep(0)
+            with pytest.raises(SchedulerFull):
+                await scheduler._acquire("A", 1)
+            queued.cancel()
+
+    asyncio.run(main())
+    assert scheduler.dropped == 1
+
+
+def test_cancelled_waiter_is_skipped_and_does_not_leak_slot():
+    scheduler = FairScheduler(global_limit=1, chat_limit=1, user_limit=10)
+    order = []
+
+    async def job(name, chat_id):
+        async with scheduler.slot(chat_id, chat_id):
+            order.append(name)
+
+    async def main():
+        async with scheduler.slot("A", "A"):
+            cancelled = asyncio.create_task(job("b", "B"))
+            waiting = asyncio.create_task(job("c", "C"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+        await asyncio.gather(waiting)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    asyncio.run(main())
+    assert order == ["c"]
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.queue_depth == 0
+
+
+def test_cancel_after_grant_returns_slot():
+    scheduler = FairScheduler(global_limit=1, chat_limit=1, user_limit=10)
+
+    async def main():
+        holder = scheduler.slot("A", "A")
+        await holder.__aenter__()
+        waiter = asyncio.create_task(scheduler._acquire("B", "B"))
+        await asyncio.sleep(0)
+        # Slot được cấp cho B (future đã có kết quả) nhưng task bị huỷ trước khi chạy tiếp
+        await holder.__aexit__(None, None, None)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        async with scheduler.slot("C", "C"):
+            pass
+
+    asyncio.run(main())
+    assert scheduler.stats()["active"] == 0
+
+
+def test_acquire_with_reserve_leaves_tokens_for_interactive():
+    bucket = TokenBucket(rate=0.001, capacity=4)
+
+    async def main():
+        await bucket.acquire(reserve=2)
+        await bucket.acquire(reserve=2)
+        # Còn 2 token = phần chừa lại → việc nền phải chờ, tin nhắn tương tác vẫn dùng được
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(bucket.acquire(reserve=2), timeout=0.05)
+        assert bucket.available()
+        assert bucket.try_acquire()
+
+    asyncio.run(main())
+
+
+def test_chat_limit_one_keeps_order_when_head_user_is_busy():
+    scheduler = FairScheduler(global_limit=10, chat_limit=1, user_limit=1)
+    order = []
+
+    async def job(name, chat_id, user_id, release=None):
+        async with scheduler.slot(chat_id, user_id):
+            order.append(name)
+            if release is not None:
+                await release.wait()
+
+    async def main():
+        busy_elsewhere = asyncio.Event()
+        first_in_chat = asyncio.Event()
+        other_chat = asyncio.create_task(job("u-in-B", "B", "u", busy_elsewhere))
+        running = asyncio.create_task(job("a0", "A", "v", first_in_chat))
+        await asyncio.sleep(0)
+        head = asyncio.create_task(job("a1-from-u", "A", "u"))
+        await asyncio.sleep(0)
+        later = asyncio.create_task(job("a2-from-w", "A", "w"))
+        await asyncio.sleep(0)
+        first_in_chat.set()
+        await asyncio.sleep(0.01)
+        # a1 chưa chạy được (user u bận ở chat B) → a2 cũng phải chờ, không vượt lên
+        assert order == ["u-in-B", "a0"]
+        busy_elsewhere.set()
+        await asyncio.gather(other_chat, running, head, later)
+
+    asyncio.run(main())
+    assert order == ["u-in-B", "a0", "a1-from-u", "a2-from-w"]
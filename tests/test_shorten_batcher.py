@@ -0,0 +1,130 @@
+import asyncio
+
+from shorten_batcher import ShortenBatcher
+
+
+def make_response(urls, short=lambda url: f"https://short/{url[-1]}"):
+    return {"success": True, "data": {"success_link": [
+        {"url_origin": url, "short_link": short(url)} for url in urls
+    ]}}
+
+
+class FakeAPI:
+    def __init__(self, respond=make_response):
+        self.calls = []
+        self.respond = respond
+
+    async def __call__(self, campaign_id, urls):
+        self.calls.append((campaign_id, list(urls)))
+        await asyncio.sleep(0)
+        return self.respond(urls)
+
+
+def test_concurrent_submits_share_one_request_per_campaign():
+    api = FakeAPI()
+
+    async def main():
+        batcher = ShortenBatcher(api, window_ms=10, max_batch_size=20)
+        return await asyncio.gather(
+            batcher.submit("shopee", "https://a/1"),
+            batcher.submit("shopee", "https://a/2"),
+            batcher.submit("lazada", "https://b/3"),
+        )
+
+    assert asyncio.run(main()) == ["https://short/1", "https://short/2", "https://short/3"]
+    assert sorted(api.calls) == [("lazada", ["https://b/3"]), ("shopee", ["https://a/1", "https://a/2"])]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    api = FakeAPI()
+
+    async def main():
+        batcher = ShortenBatcher(api, window_ms=60_000, max_batch_size=2)
+        results = await asyncio.wait_for(asyncio.gather(
+            batcher.submit("shopee", "https://a/1"),
+            batcher.submit("shopee", "https://a/2"),
+        ), timeout=1)
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert results == ["https://short/1", "https://short/2"]
+    assert batcher.stats()["sizes"] == {2: 1}
+
+
+def test_duplicate_url_is_sent_once_and_answers_every_caller():
+    api = FakeAPI()
+
+    async def main():
+        batcher = ShortenBatcher(api, window_ms=10)
+        return await asyncio.gather(*(batcher.submit("shopee", "https://a/1") for _ in range(3)))
+
+    assert asyncio.run(main()) == ["https://short/1"] * 3
+    assert api.calls == [("shopee", ["https://a/1"])]
+
+
+def test_rejected_and_failed_links_resolve_to_none():
+    def respond(urls):
+        return {"success": True, "data": {
+            "success_link": [{"url_origin": urls[0], "short_link": "https://short/ok"}],
+            "error_link": [{"url_origin": urls[1], "message": "not allowed"}],
+        }}
+
+    async def main():
+        batcher = ShortenBatcher(FakeAPI(respond), window_ms=10)
+        return await asyncio.gather(batcher.submit("c", "https://a/1"), batcher.submit("c", "https://a/2"))
+
+    assert asyncio.run(main()) == ["https://short/ok", None]
+
+
+def test_send_error_resolves_whole_batch_to_none():
+    async def failing(campaign_id, urls):
+        raise RuntimeError("boom")
+
+    async def main():
+        batcher = ShortenBatcher(failing, window_ms=10)
+        return await asyncio.gather(batcher.submit("c", "https://a/1"), batcher.submit("c", "https://a/2"))
+
+    assert asyncio.run(main()) == [None, None]
+
+
+def test_normalized_url_origin_is_matched_by_position():
+    # AccessTrade chuẩn hoá url_origin → không khớp chuỗi, nhưng đủ số lượng → ghép theo thứ tự
+    api = FakeAPI(lambda urls: make_response([url + "/" for url in urls], short=lambda url: f"https://short/{url[-2]}"))
+
+    async def main():
+        batcher = ShortenBatcher(api, window_ms=10)
+        return await asyncio.gather(batcher.submit("c", "https://a/1"), batcher.submit("c", "https://a/2"))
+
+    assert asyncio.run(main()) == ["https://short/1", "https://short/2"]
+
+
+def test_unsuccessful_response_resolves_to_none():
+    async def main():
+        batcher = ShortenBatcher(FakeAPI(lambda urls: {"success": False}), window_ms=10)
+        return await batcher.submit("c", "https://a/1")
+
+    assert asyncio.run(main()) is None
+
+
+def test_urls_queued_while_waiting_for_quota_join_the_batch():
+    api = FakeAPI()
+    tokens = []
+
+    async def acquire():
+        # Quota chặt: mỗi token phải chờ lâu hơn thời gian các URL kịp đến
+        await asyncio.sleep(0.1)
+        tokens.append(1)
+
+    async def main():
+        batcher = ShortenBatcher(api, window_ms=5, max_batch_size=10, acquire=acquire)
+        tasks = []
+        for index in range(25):
+            tasks.append(asyncio.create_task(batcher.submit("shopee", f"https://a/{index}")))
+            await asyncio.sleep(0.001)
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(main())
+    assert results == [f"https://short/{index % 10}" for index in range(25)]
+    # 25 URL → ceil(25 / 10) = 3 request, mỗi request một token
+    assert [len(urls) for _, urls in api.calls] == [10, 10, 5]
+    assert len(tokens) == 3
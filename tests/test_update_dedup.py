@@ -0,0 +1,64 @@
+import time
+
+from update_dedup import UpdateDeduplicator
+
+
+def test_second_sighting_is_duplicate():
+    dedup = UpdateDeduplicator()
+    assert dedup.is_duplicate("1:10") is False
+    assert dedup.is_duplicate("1:10") is True
+    assert dedup.is_duplicate("2:10") is False
+    assert dedup.duplicates == 1
+
+
+def test_oldest_key_is_evicted_when_full():
+    dedup = UpdateDeduplicator(max_items=3)
+    for key in ("a", "b", "c", "d"):
+        assert dedup.is_duplicate(key) is False
+    assert len(dedup) == 3
+    # "a" đã bị đẩy ra → được coi là update mới
+    assert dedup.is_duplicate("a") is False
+    assert dedup.is_duplicate("d") is True
+
+
+def test_keys_older_than_window_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    dedup = UpdateDeduplicator(window_seconds=60)
+    dedup.is_duplicate("old")
+    now[0] += 30
+    dedup.is_duplicate("new")
+    now[0] += 31
+    assert dedup.is_duplicate("old") is False
+    assert dedup.is_duplicate("new") is True
+
+
+def test_snapshot_restore_keeps_order_and_drops_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    source = UpdateDeduplicator(window_seconds=60)
+    for key in ("a", "b"):
+        source.is_duplicate(key)
+        now[0] += 40
+    snapshot = source.snapshot()
+    assert [key for key, _ in snapshot] == ["a", "b"]
+
+    target = UpdateDeduplicator(window_seconds=60)
+    target.restore(snapshot)
+    # "a" (80s trước) hết hạn, "b" (40s trước) vẫn còn
+    assert len(target) == 1
+    assert target.is_duplicate("b") is True
+    assert target.is_duplicate("a") is False
+
+
+def test_shared_file_blocks_other_process(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    first = UpdateDeduplicator(shared_path=path)
+    second = UpdateDeduplicator(shared_path=path)
+    try:
+        assert first.is_duplicate("1:1") is False
+        assert second.is_duplicate("1:1") is True
+        assert second.is_duplicate("1:2") is False
+    finally:
+        first.close()
+        second.close()
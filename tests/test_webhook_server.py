@@ -0,0 +1,61 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook_server import SECRET_HEADER, WebhookServer
+
+SECRET = "s3cret"
+UPDATE = {
+    "update_id": 42,
+    "message": {
+        "message_id": 7,
+        "date": 1700000000,
+        "chat": {"id": 100, "type": "private"},
+        "from": {"id": 100, "is_bot": False, "first_name": "A"},
+        "text": "https://shopee.vn/product/1/2",
+    },
+}
+
+
+class FakeApplication:
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+async def post(body, secret=SECRET, raw=None):
+    """Gửi một request tới WebhookServer thật (aiohttp test server); trả (status, server)."""
+    server = WebhookServer(FakeApplication(), "127.0.0.1", 0, "/telegram", SECRET)
+    async with TestClient(TestServer(server.make_app())) as client:
+        headers = {SECRET_HEADER: secret} if secret is not None else {}
+        if raw is not None:
+            response = await client.post(server.path, data=raw, headers=headers)
+        else:
+            response = await client.post(server.path, json=body, headers=headers)
+        return response.status, server
+
+
+def test_wrong_or_missing_secret_is_rejected():
+    for secret in ("wrong", None):
+        status, server = asyncio.run(post(UPDATE, secret=secret))
+        assert status == 403
+        assert server.rejected == 1
+        assert server.application.update_queue.empty()
+
+
+def test_valid_update_is_dispatched():
+    status, server = asyncio.run(post(UPDATE))
+    assert status == 200
+    assert server.received == 1
+    update = server.application.update_queue.get_nowait()
+    assert update.update_id == 42
+    assert update.message.text == "https://shopee.vn/product/1/2"
+
+
+def test_non_object_or_invalid_body_is_bad_request():
+    for body in ([UPDATE], 5, "text", {"message": {}}):
+        status, server = asyncio.run(post(body))
+        assert status == 400, body
+        assert server.application.update_queue.empty()
+    status, _ = asyncio.run(post(None, raw=b"{not json"))
+    assert status == 400
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+
+# Sentinel phân biệt "không có trong cache" với giá trị None đã cache
+MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU giới hạn kích thước, mỗi entry có TTL riêng (hỗ trợ cache kết quả âm)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def snapshot(self):
+        """Các entry còn hạn theo thứ tự LRU: [key, value, TTL còn lại (giây)]."""
+        now = time.monotonic()
+        return [[key, value, expires_at - now] for key, (value, expires_at) in self._data.items() if expires_at > now]
+
+    def restore(self, entries, age=0):
+        """Nạp lại snapshot đã lưu `age` giây trước (bỏ entry đã hết hạn)."""
+        for key, value, remaining in entries:
+            if remaining > age:
+                self.set(key, value, ttl=remaining - age)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0,
+        }
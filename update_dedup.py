@@ -0,0 +1,97 @@
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class UpdateDeduplicator:
+    """Lọc update trùng: O(1) thêm/tra/xoá, giới hạn theo số lượng và cửa sổ thời gian.
+
+    Nếu có `shared_path`, dùng thêm một file SQLite chung để nhiều process
+    (khác BOT_INSTANCE_ID) trên cùng host không xử lý trùng cùng một update.
+    """
+
+    def __init__(self, window_seconds=600, max_items=10000, shared_path=None):
+        self.window = window_seconds
+        self.max_items = max_items
+        self.shared_path = shared_path
+        self._seen = OrderedDict()  # key -> thời điểm nhận (theo thứ tự chèn)
+        self._db = None
+        self._claims = 0
+        self.duplicates = 0
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.shared_path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS seen_updates (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def _evict(self, now):
+        # Phần tử cũ nhất luôn ở đầu → mỗi lần xoá là O(1); chừa chỗ cho key sắp thêm
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if len(self._seen) < self.max_items and now - seen_at <= self.window:
+                break
+            self._seen.popitem(last=False)
+
+    def _claim_shared(self, key, now):
+        """Giành quyền xử lý key trong file SQLite chung. False nếu process khác đã nhận."""
+        try:
+            db = self._connect()
+            cursor = db.execute("INSERT OR IGNORE INTO seen_updates (key, seen_at) VALUES (?, ?)", (key, now))
+            self._claims += 1
+            if self._claims % 1000 == 0:
+                db.execute("DELETE FROM seen_updates WHERE seen_at < ?", (now - self.window,))
+            db.commit()
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            # Lỗi file chung không được chặn xử lý tin nhắn
+            logging.error(f"❌ Lỗi dedup SQLite: {e}")
+            return True
+
+    def is_duplicate(self, key):
+        """Trả True nếu key đã được xử lý; ngược lại đánh dấu key là đã xử lý."""
+        now = time.time()
+        self._evict(now)
+
+        if key in self._seen:
+            self.duplicates += 1
+            return True
+
+        self._seen[key] = now
+        if self.shared_path and not self._claim_shared(key, now):
+            self.duplicates += 1
+            return True
+        return False
+
+    def snapshot(self):
+        """Cửa sổ dedup hiện tại: [key, thời điểm nhận] từ cũ đến mới."""
+        return [[key, seen_at] for key, seen_at in self._seen.items()]
+
+    def restore(self, entries, age=0):
+        """Nạp lại cửa sổ dedup (gọi trước khi nhận update để giữ thứ tự cũ → mới)."""
+        for key, seen_at in entries:
+            self._seen.setdefault(key, seen_at)
+        self._evict(time.time())
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._seen)
+
+
+def message_key(message):
+    """message_id chỉ duy nhất trong từng chat → khoá theo (chat_id, message_id)."""
+    return f"{message.chat_id}:{message.message_id}"
+
+
+def update_key(update):
+    if update.message is not None:
+        return message_key(update.message)
+    return f"u:{update.update_id}"
@@ -0,0 +1,103 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """HTTP server (aiohttp) nhận update từ Telegram và đẩy vào update_queue của Application."""
+
+    def __init__(self, application, listen, port, path, secret_token):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._runner = None
+        self.received = 0
+        self.rejected = 0
+
+    async def handle_update(self, request):
+        # Chỉ nhận request có đúng secret token mà ta đã đăng ký qua setWebhook
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.rejected += 1
+            return web.Response(status=400)
+        if not isinstance(data, dict):
+            # Body hợp lệ JSON nhưng không phải object (mảng, số...) → không phải update
+            self.rejected += 1
+            return web.Response(status=400)
+
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (KeyError, TypeError, ValueError):
+            self.rejected += 1
+            return web.Response(status=400)
+        if update is not None:
+            self.received += 1
+            await self.application.update_queue.put(update)
+        return web.Response()
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logging.info(f"🌐 Webhook server lắng nghe {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_webhook(application, webhook_url, listen, port, path, secret_token,
+                      allowed_updates, max_connections):
+    """Chạy Application ở chế độ webhook với server aiohttp riêng (thay cho run_polling)."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    server = WebhookServer(application, listen, port, path, secret_token)
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await server.start()
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=allowed_updates,
+            max_connections=max_connections,
+        )
+        await application.start()
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from http_client import http_client
+
+
+def shard_key(update):
+    """chat_id của update (dict JSON thô); update không có chat → update_id."""
+    for value in update.values():
+        if isinstance(value, dict):
+            chat = value.get("chat") or (value.get("message") or {}).get("chat")
+            if chat and "id" in chat:
+                return chat["id"]
+    return update.get("update_id", 0)
+
+
+class WorkerPool:
+    """N worker process chạy handler của bot; mỗi chat luôn vào cùng một worker.
+
+    Thứ tự update của một chat được giữ tới worker; trong worker, thứ tự xử lý do scheduler quyết định
+    (worker_env của bot đặt SCHED_CHAT_CONCURRENCY=1 → tin nhắn trong chat chạy tuần tự).
+
+    Update (JSON thô) được đẩy qua pipe riêng của từng worker; worker chết sẽ được khởi động lại.
+    """
+
+    def __init__(self, size, app_factory, worker_env=None, restart_delay=1.0):
+        self.size = max(1, size)
+        self.app_factory = app_factory  # hàm top-level tạo Application (pickle theo tên, gọi trong worker)
+        self.worker_env = worker_env    # index -> dict biến môi trường riêng của worker
+        self.restart_delay = restart_delay
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes = [None] * self.size
+        self._conns = [None] * self.size
+        self._queues = []
+        self._tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="worker-pipe")
+        self._stopping = False
+        self.forwarded = [0] * self.size
+        self.restarts = 0
+
+    def _spawn(self, index):
+        reader, writer = self._ctx.Pipe(duplex=False)
+        env = self.worker_env(index) if self.worker_env else {}
+        process = self._ctx.Process(target=run_worker, args=(reader, self.app_factory), name=f"bot-worker-{index}")
+        # Worker (spawn) nhận bản sao os.environ lúc start → config của worker đọc đúng giá trị riêng
+        saved = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        try:
+            process.start()
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        reader.close()
+        self._processes[index] = process
+        self._conns[index] = writer
+        logging.info(f"👷 Worker {index} đã chạy (pid {process.pid})")
+
+    async def start(self):
+        self._queues = [asyncio.Queue() for _ in range(self.size)]
+        for index in range(self.size):
+            self._spawn(index)
+        self._tasks = [asyncio.create_task(self._sender(index)) for index in range(self.size)]
+        self._tasks.append(asyncio.create_task(self._monitor()))
+
+    def submit(self, update):
+        """Đưa update vào hàng đợi của worker phụ trách chat đó (không chặn)."""
+        index = shard_key(update) % self.size
+        self._queues[index].put_nowait(json.dumps(update).encode())
+
+    async def _sender(self, index):
+        """Gửi tuần tự (giữ thứ tự) qua pipe của worker; pipe đầy chỉ chặn worker đó."""
+        loop = asyncio.get_running_loop()
+        queue = self._queues[index]
+        while True:
+            data = await queue.get()
+            while True:
+                try:
+                    await loop.run_in_executor(self._executor, self._conns[index].send_bytes, data)
+                    self.forwarded[index] += 1
+                    break
+                except (OSError, ValueError) as e:
+                    # Worker vừa chết → chờ monitor khởi động lại rồi gửi lại update này
+                    logging.warning(f"⚠️ Không gửi được update cho worker {index}: {type(e).__name__}")
+                    await asyncio.sleep(self.restart_delay)
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.restart_delay)
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    logging.error(f"💥 Worker {index} đã dừng (exit code {process.exitcode}), khởi động lại")
+                    self.restarts += 1
+                    self._conns[index].close()
+                    _kill_process_group(process.pid)
+                    self._spawn(index)
+
+    @property
+    def queue_depths(self):
+        return [queue.qsize() for queue in self._queues]
+
+    async def stop(self, timeout=30, kill_timeout=5):
+        """Đóng pipe (worker xử lý nốt update đang có rồi tự thoát), chờ tối đa `timeout` giây.
+
+        Worker không tự dừng bị terminate rồi kill; cuối cùng dọn cả process group của worker
+        (process con render QR) để không để lại process spawn_main mồ côi.
+        """
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for conn in self._conns:
+            if conn is not None:
+                conn.close()
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logging.warning(f"⚠️ Worker {index} không tự dừng, terminate")
+                process.terminate()
+                await loop.run_in_executor(None, process.join, kill_timeout)
+            if process.is_alive():
+                logging.warning(f"⚠️ Worker {index} không dừng sau SIGTERM, kill")
+                process.kill()
+                await loop.run_in_executor(None, process.join)
+            _kill_process_group(process.pid)
+        self._executor.shutdown(wait=False)
+
+
+async def _get_updates(api_url, offset, timeout, allowed_updates, limit=100):
+    params = {"offset": offset, "timeout": timeout, "limit": limit, "allowed_updates": json.dumps(allowed_updates)}
+    async with http_client.get(f"{api_url}/getUpdates", params=params,
+                               timeout=aiohttp.ClientTimeout(total=timeout + 10)) as response:
+        data = await response.json(content_type=None)
+    if not data.get("ok"):
+        raise RuntimeError(f"getUpdates lỗi {data.get('error_code')}: {data.get('description')}")
+    return data["result"]
+
+
+async def run_ingress(api_url, pool, allowed_updates, poll_timeout=30, stop_event=None):
+    """Tiến trình ingress: long-poll getUpdates (JSON thô, không parse thành Update) và chia cho worker pool.
+
+    Dừng khi nhận SIGINT/SIGTERM (hoặc khi `stop_event` được set, nếu truyền vào).
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+    await http_client.start()
+    await pool.start()
+    offset = 0
+    try:
+        async with http_client.post(f"{api_url}/deleteWebhook") as response:
+            await response.read()
+        logging.info(f"📥 Ingress đang nhận update cho {pool.size} worker")
+
+        stopped = asyncio.create_task(stop_event.wait())
+        errors = 0
+        while not stop_event.is_set():
+            fetch = asyncio.create_task(_get_updates(api_url, offset, poll_timeout, allowed_updates))
+            await asyncio.wait({fetch, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not fetch.done():
+                fetch.cancel()
+                break
+            try:
+                updates = fetch.result()
+                errors = 0
+            except Exception as e:
+                errors += 1
+                logging.error(f"❌ Lỗi getUpdates: {type(e).__name__}: {e}")
+                await asyncio.sleep(min(30, 2 ** errors))
+                continue
+            for update in updates:
+                pool.submit(update)
+                offset = update["update_id"] + 1
+    finally:
+        if offset:
+            # Xác nhận với Telegram các update đã nhận (giống run_polling khi dừng)
+            try:
+                await _get_updates(api_url, offset, 0, allowed_updates, limit=1)
+            except Exception as e:
+                logging.warning(f"⚠️ Không xác nhận được offset {offset}: {type(e).__name__}")
+        await pool.stop()
+        await http_client.close()
+        logging.info(f"🛑 Ingress dừng (đã chuyển {sum(pool.forwarded)} update, khởi động lại worker {pool.restarts} lần)")
+
+
+def _kill_process_group(pgid):
+    """Kill các process còn sót trong nhóm của worker (vd. process render QR khi worker bị kill)."""
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+        logging.warning(f"⚠️ Đã kill process còn sót trong nhóm {pgid}")
+    except (ProcessLookupError, PermissionError):
+        # Nhóm đã trống: worker đã dọn process con khi dừng
+        pass
+
+
+def run_worker(conn, app_factory):
+    """Entry point của worker process: chạy Application của bot, nhận update từ pipe."""
+    # Nhóm process riêng (pgid = pid worker) → ingress dọn được cả process con của worker khi dừng
+    os.setpgid(0, 0)
+    asyncio.run(_serve(app_factory(), conn))
+
+
+async def _serve(application, conn):
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    # Worker ở nhóm process riêng nên Ctrl+C chỉ tới ingress; vẫn bỏ qua SIGINT gửi thẳng tới worker,
+    # chờ ingress đóng pipe để xử lý nốt update
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+
+    def on_readable():
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            loop.remove_reader(conn.fileno())
+            stop_event.set()
+            return
+        update = Update.de_json(json.loads(data), application.bot)
+        if update is not None:
+            application.update_queue.put_nowait(update)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        loop.add_reader(conn.fileno(), on_readable)
+        await stop_event.wait()
+    finally:
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)